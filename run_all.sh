@@ -1,6 +1,7 @@
 #!/bin/bash
 # Script to run all services for WhatsApp Scheduler
-# This runs: migrations, Django server, scheduler loop, and worker
+# This runs: migrations, Django server, and the dispatcher (scheduler loop and
+# workers)
 
 set -e
 
@@ -15,20 +16,14 @@ echo "Starting Django server..."
 python manage.py runserver 0.0.0.0:8000 &
 DJANGO_PID=$!
 
-# Start scheduler loop in background
-echo "Starting scheduler loop..."
-python manage.py scheduler_loop &
-SCHEDULER_PID=$!
-
-# Start worker in background
-echo "Starting worker..."
-python manage.py worker &
-WORKER_PID=$!
+# Start scheduler loop and workers in background
+echo "Starting dispatcher..."
+python manage.py run_dispatcher ${DISPATCHER_WORKERS:+--workers $DISPATCHER_WORKERS} &
+DISPATCHER_PID=$!
 
 echo "All services started!"
 echo "Django server PID: $DJANGO_PID"
-echo "Scheduler loop PID: $SCHEDULER_PID"
-echo "Worker PID: $WORKER_PID"
+echo "Dispatcher PID: $DISPATCHER_PID"
 echo ""
 echo "Press Ctrl+C to stop all services"
 
@@ -36,7 +31,7 @@ echo "Press Ctrl+C to stop all services"
 cleanup() {
     echo ""
     echo "Stopping all services..."
-    kill $DJANGO_PID $SCHEDULER_PID $WORKER_PID 2>/dev/null || true
+    kill $DJANGO_PID $DISPATCHER_PID 2>/dev/null || true
     wait
     echo "All services stopped."
     exit 0
@@ -1,9 +1,185 @@
+from datetime import timedelta
+from django import forms
 from django.contrib import admin
-from .models import MessageQueue
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .campaigns import progress, with_progress
+from .ingest import MessageValidationError
+from .models import Campaign, MessageArchive, MessageQueue, RecurringSchedule
+from .recurring import build_rule, first_run
+
+# Rows counted at most for a filtered changelist
+COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts a large table exactly.
+
+    An unfiltered PostgreSQL table reports the planner's row estimate
+    (pg_class.reltuples); anything else is counted up to COUNT_LIMIT rows,
+    so a filtered changelist offers at most COUNT_LIMIT / per_page pages.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > COUNT_LIMIT:
+                return int(row[0])
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class ScheduledWindowFilter(admin.SimpleListFilter):
+    """Bound the changelist to a window of scheduled_time.
+
+    Defaults to the past and next 24 hours, so status filters and searches
+    scan an index range instead of the whole table. "Any time" lifts the
+    bound.
+    """
+
+    title = "scheduled"
+    parameter_name = "scheduled"
+    DEFAULT_WINDOW = timedelta(hours=24)
+    WINDOWS = {
+        "1h": ("Past hour", timedelta(hours=1), timedelta(0)),
+        "7d": ("Past 7 days", timedelta(days=7), timedelta(0)),
+        "30d": ("Past 30 days", timedelta(days=30), timedelta(0)),
+        "upcoming": ("Upcoming", timedelta(0), None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _, _) in self.WINDOWS.items()] + [
+            ("any", "Any time")
+        ]
+
+    def choices(self, changelist):
+        choices = super().choices(changelist)
+        default = next(choices)
+        default["display"] = "Past and next 24 hours"
+        yield default
+        yield from choices
+
+    def queryset(self, request, queryset):
+        if self.value() == "any":
+            return queryset
+        now = timezone.now()
+        before, after = self.DEFAULT_WINDOW, self.DEFAULT_WINDOW
+        if self.value() in self.WINDOWS:
+            _, before, after = self.WINDOWS[self.value()]
+        queryset = queryset.filter(scheduled_time__gte=now - before)
+        if after is not None:
+            queryset = queryset.filter(scheduled_time__lt=now + after)
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist for message tables with tens of millions of rows.
+
+    No exact counts (EstimatedCountPaginator, no full result count, no
+    filter facets), a scheduled_time window on every page, and search by
+    phone prefix, exact sender (with or without the ``whatsapp:`` prefix)
+    plus, on PostgreSQL, full-text search of ``fulltext_field``. The prefix
+    and full-text indexes are created by migration 0009 on PostgreSQL only.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    list_filter = (ScheduledWindowFilter, "status")
+    ordering = ("-scheduled_time", "-id")
+    search_fields = ("phone", "from_number")
+    fulltext_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        senders = [term]
+        if not term.startswith("whatsapp:"):
+            senders.append(f"whatsapp:{term}")
+        condition = Q(phone__startswith=term) | Q(from_number__in=senders)
+        if self.fulltext_field:
+            condition |= self.fulltext_match(queryset, term)
+        return queryset.filter(condition), False
+
+    def fulltext_match(self, queryset, term):
+        if connections[queryset.db].vendor != "postgresql":
+            # Small development databases: a plain scan is fine
+            return Q(**{f"{self.fulltext_field}__icontains": term})
+        column = f'"{queryset.model._meta.db_table}"."{self.fulltext_field}"'
+        # Must match the indexed expression of migration 0009
+        return Q(
+            RawSQL(
+                f"to_tsvector('simple', {column}) @@ plainto_tsquery('simple', %s)",
+                [term],
+                output_field=BooleanField(),
+            )
+        )
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    """Campaigns with recipient progress counters instead of one row each."""
+
+    list_display = (
+        "id",
+        "name",
+        "from_number",
+        "scheduled_time",
+        "total",
+        "pending",
+        "sent",
+        "failed",
+    )
+    search_fields = ("name",)
+    readonly_fields = ("created_at", "progress_counts")
+
+    def get_queryset(self, request):
+        return with_progress(super().get_queryset(request))
+
+    def has_delete_permission(self, request, obj=None):
+        # Recipients are protected; delete_campaign removes them in chunks
+        return False
+
+    @admin.display(description="Recipients")
+    def total(self, obj):
+        return progress(obj)["total"]
+
+    @admin.display(description="Waiting")
+    def pending(self, obj):
+        counts = progress(obj)
+        return (
+            counts[MessageQueue.STATUS_PENDING]
+            + counts[MessageQueue.STATUS_ENQUEUED]
+            + counts[MessageQueue.STATUS_PROCESSING]
+        )
+
+    @admin.display(description="Sent")
+    def sent(self, obj):
+        return progress(obj)[MessageQueue.STATUS_SENT]
+
+    @admin.display(description="Failed")
+    def failed(self, obj):
+        return progress(obj)[MessageQueue.STATUS_FAILED]
+
+    @admin.display(description="Progress")
+    def progress_counts(self, obj):
+        return ", ".join(f"{status}: {count}" for status, count in progress(obj).items())
 
 
 @admin.register(MessageQueue)
-class MessageQueueAdmin(admin.ModelAdmin):
+class MessageQueueAdmin(LargeTableAdmin):
     list_display = (
         "id",
         "phone",
@@ -14,6 +190,71 @@ class MessageQueueAdmin(admin.ModelAdmin):
         "created_at",
         "processed_at",
     )
-    list_filter = ("status",)
-    search_fields = ("phone", "body", "from_number")
+    search_help_text = (
+        "Phone number prefix, sender number, or words in the message body "
+        "(campaign recipients have no body of their own and don't match by "
+        "body)"
+    )
+    fulltext_field = "body"
     readonly_fields = ("created_at", "processed_at", "attempts", "result")
+    raw_id_fields = ("campaign",)
+
+
+class RecurringScheduleForm(forms.ModelForm):
+    class Meta:
+        model = RecurringSchedule
+        fields = "__all__"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if all(cleaned_data.get(f) for f in ("rrule", "dtstart", "time_zone")):
+            try:
+                build_rule(
+                    cleaned_data["rrule"],
+                    cleaned_data["dtstart"],
+                    cleaned_data["time_zone"],
+                )
+            except MessageValidationError as e:
+                raise forms.ValidationError(str(e))
+        return cleaned_data
+
+
+@admin.register(RecurringSchedule)
+class RecurringScheduleAdmin(admin.ModelAdmin):
+    form = RecurringScheduleForm
+    list_display = (
+        "id",
+        "name",
+        "phone",
+        "rrule",
+        "time_zone",
+        "next_run_at",
+        "active",
+    )
+    list_filter = ("active",)
+    search_fields = ("name", "phone")
+    readonly_fields = ("next_run_at", "created_at")
+
+    def save_model(self, request, obj, form, change):
+        # A new or edited rule restarts from its next occurrence. Occurrences
+        # before the old next_run_at were already materialised.
+        rule_fields = {"rrule", "dtstart", "time_zone", "active"}
+        if not change or rule_fields & set(form.changed_data):
+            start = max(filter(None, [timezone.now(), obj.next_run_at]))
+            obj.next_run_at = first_run(obj, start) if obj.active else None
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(LargeTableAdmin):
+    list_display = (
+        "id",
+        "phone",
+        "from_number",
+        "status",
+        "scheduled_time",
+        "processed_at",
+        "archived_at",
+    )
+    search_help_text = "Phone number prefix or sender number"
+    readonly_fields = [field.name for field in MessageArchive._meta.fields]
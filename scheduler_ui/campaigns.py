@@ -0,0 +1,194 @@
+"""
+Campaigns: one message template sent to many recipients.
+
+The template body is stored once on the Campaign. Each recipient is a compact
+MessageQueue row with an empty body and the recipient's ``variables``, so a
+large broadcast does not store the body once per recipient. Workers render the
+body at send time (message_body()), keeping the templates they have read in a
+small per-process cache.
+
+Recipient rows still carry from_number: sharding, claiming and per-sender
+rate limiting work on MessageQueue rows alone, without a join.
+"""
+
+import re
+import threading
+import time
+from functools import partial
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .ingest import MessageValidationError, bulk_schedule, parse_scheduled_time
+from .models import Campaign, MessageArchive, MessageQueue
+
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+# A template is reused for up to this many seconds, so an edited campaign
+# body reaches running workers within that time
+TEMPLATE_CACHE_TTL = 60
+TEMPLATE_CACHE_SIZE = 1024
+
+_templates = {}  # campaign id -> (expires at, body)
+_templates_lock = threading.Lock()
+
+
+def placeholders(template):
+    """The set of ``{name}`` placeholders used in ``template``."""
+    return set(PLACEHOLDER.findall(template))
+
+
+def render(template, variables):
+    """Fill the ``{name}`` placeholders of ``template`` from ``variables``.
+
+    Only plain placeholders are substituted (no attribute access or format
+    specs). Raises MessageValidationError when a variable is missing.
+    """
+
+    def substitute(match):
+        try:
+            return str(variables[match.group(1)])
+        except KeyError:
+            raise MessageValidationError(f"Missing variable: {match.group(1)}")
+
+    return PLACEHOLDER.sub(substitute, template)
+
+
+def campaign_template(campaign_id):
+    """The body template of a campaign, from the per-process cache."""
+    now = time.monotonic()
+    with _templates_lock:
+        entry = _templates.get(campaign_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    body = Campaign.objects.values_list("body", flat=True).get(pk=campaign_id)
+    with _templates_lock:
+        if len(_templates) >= TEMPLATE_CACHE_SIZE:
+            _templates.clear()
+        _templates[campaign_id] = (now + TEMPLATE_CACHE_TTL, body)
+    return body
+
+
+def message_body(msg):
+    """The text to send for ``msg``: its own body, or its rendered campaign template."""
+    if msg.campaign_id is None:
+        return msg.body
+    return render(campaign_template(msg.campaign_id), msg.variables or {})
+
+
+def clean_campaign(payload, from_number):
+    """Validate a campaign creation request.
+
+    Returns a dict of Campaign field values, or raises MessageValidationError.
+    """
+    if not isinstance(payload, dict):
+        raise MessageValidationError("expected a JSON object")
+
+    body = payload.get("body")
+    scheduled_time_str = payload.get("scheduled_time")
+    if not body:
+        raise MessageValidationError("body is required")
+    if not from_number:
+        raise MessageValidationError(
+            "TWILIO_WHATSAPP_FROM environment variable is not set"
+        )
+    if not scheduled_time_str:
+        raise MessageValidationError("scheduled_time is required")
+
+    try:
+        scheduled_time = parse_scheduled_time(scheduled_time_str)
+    except Exception as e:
+        raise MessageValidationError(f"Invalid scheduled_time format: {str(e)}")
+    if scheduled_time <= timezone.now():
+        raise MessageValidationError("scheduled_time must be in the future")
+
+    return {
+        "name": str(payload.get("name") or "")[:200],
+        "body": body,
+        "from_number": from_number,
+        "scheduled_time": scheduled_time,
+    }
+
+
+def clean_recipient(campaign, required, payload, from_number):
+    """Validate one recipient of ``campaign``.
+
+    ``required`` is the set of placeholders of the campaign body; every one
+    must have a value in the recipient's ``variables``. Returns a dict of
+    MessageQueue field values.
+    """
+    if not isinstance(payload, dict):
+        raise MessageValidationError("expected a JSON object")
+
+    phone = payload.get("phone")
+    variables = payload.get("variables") or {}
+    if not phone:
+        raise MessageValidationError("phone is required")
+    if not isinstance(variables, dict):
+        raise MessageValidationError("variables must be an object")
+    missing = sorted(required - variables.keys())
+    if missing:
+        raise MessageValidationError(f"Missing variables: {', '.join(missing)}")
+
+    return {
+        "phone": phone,
+        "body": "",
+        "from_number": from_number,
+        "scheduled_time": campaign.scheduled_time,
+        "campaign": campaign,
+        "variables": variables or None,
+    }
+
+
+def add_recipients(campaign, items, chunk_size=1000):
+    """Validate and insert recipients of ``campaign`` in chunks.
+
+    Same input and results as ingest.bulk_schedule: yields one
+    ``(index, queued_id, error, duplicate)`` per item, in input order.
+    """
+    clean = partial(clean_recipient, campaign, placeholders(campaign.body))
+    return bulk_schedule(items, campaign.from_number, chunk_size, clean=clean)
+
+
+def _archived_count(status):
+    return Coalesce(
+        Subquery(
+            MessageArchive.objects.filter(campaign_id=OuterRef("pk"), status=status)
+            .order_by()
+            .values("campaign_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def with_progress(campaigns):
+    """Annotate a Campaign queryset with per-status recipient counts.
+
+    Live rows are counted per status in one grouped join; sent and failed
+    rows already moved out by archive_messages are counted from the archive.
+    Read the result with progress().
+    """
+    live = {
+        f"count_{status}": Count("messages", filter=Q(messages__status=status))
+        for status, _ in MessageQueue.STATUS_CHOICES
+    }
+    return campaigns.annotate(
+        **live,
+        archived_sent=_archived_count(MessageQueue.STATUS_SENT),
+        archived_failed=_archived_count(MessageQueue.STATUS_FAILED),
+    )
+
+
+def progress(campaign):
+    """Recipient counts by status plus ``total``, for a with_progress() campaign."""
+    counts = {
+        status: getattr(campaign, f"count_{status}")
+        for status, _ in MessageQueue.STATUS_CHOICES
+    }
+    counts[MessageQueue.STATUS_SENT] += campaign.archived_sent
+    counts[MessageQueue.STATUS_FAILED] += campaign.archived_failed
+    counts["total"] = sum(counts.values())
+    return counts
@@ -0,0 +1,104 @@
+"""
+Race-free claiming of MessageQueue rows by concurrent processes.
+
+Used by scheduler_loop (pending -> enqueued), the worker (enqueued ->
+processing) and the DB queue mode of process_queue (pending -> processing). Candidates are selected with
+SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+concurrent claimers split the rows between them. Elsewhere the conditional
+UPDATE's row count detects a lost race, and the chunk is then claimed row by
+row to find out which rows are still ours.
+
+Rows in processing carry a lease (lease_expires_at). reclaim_expired() hands
+rows whose claimer died without recording an outcome back to pending; both
+process_queue and scheduler_loop (for the Redis workers) call it.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import MessageQueue
+
+
+class ClaimRaceLost(Exception):
+    """Some rows of a chunk were claimed by another process."""
+
+
+def _row_id(row):
+    # Model instances or values_list() rows with the id first
+    return row.id if isinstance(row, MessageQueue) else row[0]
+
+
+def claim(candidates, limit, from_status, **changes):
+    """Claim up to ``limit`` rows of ``candidates`` by applying ``changes``.
+
+    ``candidates`` is an ordered MessageQueue queryset of rows in
+    ``from_status`` (model instances, or values_list() rows starting with the
+    id). A row is claimed when a conditional UPDATE moves it out of
+    ``from_status``. Returns the claimed rows as loaded, i.e. without
+    ``changes`` applied.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        rows = list(candidates[:limit])
+        if not rows:
+            return []
+
+        try:
+            with transaction.atomic():
+                claimed = MessageQueue.objects.filter(
+                    id__in=[_row_id(row) for row in rows], status=from_status
+                ).update(**changes)
+                if claimed != len(rows):
+                    raise ClaimRaceLost()
+        except ClaimRaceLost:
+            # Another process claimed part of the chunk between our SELECT
+            # and UPDATE; the savepoint is rolled back, redo it per row.
+            rows = [
+                row
+                for row in rows
+                if MessageQueue.objects.filter(
+                    id=_row_id(row), status=from_status
+                ).update(**changes)
+            ]
+
+    return rows
+
+
+def reclaim_expired(now=None):
+    """Hand processing messages whose lease expired back to pending.
+
+    Their claimer died mid-send, so the send may or may not have happened.
+    Messages that are out of attempts are marked failed instead. Returns
+    (requeued ids, failed ids).
+    """
+    now = now or timezone.now()
+    expired = MessageQueue.objects.filter(
+        status=MessageQueue.STATUS_PROCESSING, lease_expires_at__lt=now
+    )
+    rows = list(expired.values_list("id", "attempts"))
+    if not rows:
+        return [], []
+
+    exhausted = [
+        message_id
+        for message_id, attempts in rows
+        if attempts >= settings.SEND_MAX_ATTEMPTS
+    ]
+    retry = [
+        message_id
+        for message_id, attempts in rows
+        if attempts < settings.SEND_MAX_ATTEMPTS
+    ]
+    expired.filter(id__in=exhausted).update(
+        status=MessageQueue.STATUS_FAILED,
+        result="Lease expired on the last attempt",
+        processed_at=now,
+    )
+    expired.filter(id__in=retry).update(
+        status=MessageQueue.STATUS_PENDING,
+        result="Lease expired, requeued",
+    )
+    return retry, exhausted
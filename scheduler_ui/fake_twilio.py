@@ -0,0 +1,60 @@
+"""
+Local stand-in for the Twilio Messages API.
+
+Used by the ``http_stub`` sender backend (see whatsapp_scheduler.actions) to
+load-test the pipeline without sending real messages. Every POST is answered
+after a configurable latency with either a fake message sid, a 500 or a 429.
+"""
+
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like the real API does
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        roll = random.random()
+        if roll < server.error_rate:
+            status, payload = 500, {"code": 20500, "message": "Internal Server Error"}
+        elif roll < server.error_rate + server.throttle_rate:
+            status, payload = 429, {"code": 20429, "message": "Too Many Requests"}
+        else:
+            status, payload = 201, {"sid": f"SM{uuid.uuid4().hex}", "status": "queued"}
+
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request would dominate a benchmark run
+        pass
+
+
+def make_server(
+    host="127.0.0.1",
+    port=8765,
+    latency=0.1,
+    jitter=0.02,
+    error_rate=0.0,
+    throttle_rate=0.0,
+):
+    """Build a fake Twilio server; latency/jitter in seconds, rates in 0..1."""
+    server = ThreadingHTTPServer((host, port), FakeTwilioHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    return server
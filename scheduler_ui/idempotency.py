@@ -0,0 +1,83 @@
+"""
+Idempotency keys for the scheduling endpoints.
+
+A client that retries a scheduling request sends the same key (the
+Idempotency-Key header, or an ``idempotency_key`` field per item) and gets
+back the message created by the first attempt instead of a new one. Keys are
+stored on MessageQueue under a unique index per from_number, which is the
+source of truth. Single requests check a Redis copy of key -> id first, so a
+retry storm does not reach the database.
+
+A key is bound to its message for IDEMPOTENCY_KEY_TTL seconds. An expired key
+is released (cleared from the old row) the next time it is used. Archived
+messages do not keep their keys.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+from .models import MessageQueue
+from .redis_queue import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+
+
+def _key(from_number, key):
+    return f"idem:{from_number}:{key}"
+
+
+def request_key(request):
+    """The Idempotency-Key header of ``request``, or None."""
+    return request.headers.get(HEADER) or None
+
+
+def cached_id(from_number, key):
+    """The message id cached for ``key``, or None on a miss."""
+    try:
+        value = get_redis_client().get(_key(from_number, key))
+    except Exception:
+        logger.warning("Idempotency key cache unavailable", exc_info=True)
+        return None
+    return int(value) if value is not None else None
+
+
+def remember(messages):
+    """Cache key -> id for the keyed ones of newly created ``messages``."""
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for msg in messages:
+            if msg.idempotency_key:
+                pipe.set(
+                    _key(msg.from_number, msg.idempotency_key),
+                    msg.id,
+                    ex=settings.IDEMPOTENCY_KEY_TTL,
+                    nx=True,
+                )
+        pipe.execute()
+    except Exception:
+        logger.warning("Failed to cache idempotency keys", exc_info=True)
+
+
+def find_existing(from_number, keys):
+    """Map each of ``keys`` still bound to a message to that message's id.
+
+    One indexed query for any number of keys. Keys older than
+    IDEMPOTENCY_KEY_TTL are released so a new message can take them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    existing, expired = {}, []
+    rows = MessageQueue.objects.filter(
+        from_number=from_number, idempotency_key__in=keys
+    ).values_list("idempotency_key", "id", "created_at")
+    for key, message_id, created_at in rows:
+        if created_at >= cutoff:
+            existing[key] = message_id
+        else:
+            expired.append(message_id)
+    if expired:
+        MessageQueue.objects.filter(id__in=expired).update(idempotency_key=None)
+    return existing
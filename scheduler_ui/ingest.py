@@ -0,0 +1,298 @@
+"""
+Validation and bulk insertion of scheduling requests.
+
+trigger_action, the bulk endpoint and the import_messages command all go
+through clean_message() so a message is accepted by the same rules whichever
+way it comes in. Bulk input is read incrementally (NDJSON lines or the items
+of a JSON array) and written with chunked bulk_create, so memory use does not
+grow with the size of the payload.
+"""
+
+import codecs
+import json
+import os
+from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .idempotency import find_existing, remember
+from .models import MessageQueue
+from .redis_queue import schedule_delayed
+from .status_cache import cache_messages
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Longest single item iter_json_array buffers while waiting for it to parse;
+# a malformed item must not pull the rest of the body into memory
+MAX_ITEM_SIZE = 4 * 1024 * 1024
+
+
+class MessageValidationError(ValueError):
+    """Raised when a scheduling request is missing or has invalid fields."""
+
+
+def default_from_number():
+    """The Twilio WhatsApp number messages are sent from."""
+    # Get from_number from environment variable (fallback to settings)
+    return os.environ.get("TWILIO_WHATSAPP_FROM") or getattr(
+        settings, "TWILIO_WHATSAPP_FROM", ""
+    )
+
+
+def parse_scheduled_time(value):
+    """Parse an ISO datetime string into a timezone-aware datetime."""
+    try:
+        # Fast path for ISO 8601, which is what the UI and most clients send
+        scheduled_time = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        from dateutil import parser as date_parser
+
+        scheduled_time = date_parser.parse(value)
+    # Ensure timezone-aware
+    if scheduled_time.tzinfo is None:
+        scheduled_time = timezone.make_aware(scheduled_time)
+    return scheduled_time
+
+
+def clean_message(payload, from_number):
+    """Validate one scheduling request.
+
+    Returns a dict of MessageQueue field values, or raises
+    MessageValidationError with the reason the request was rejected.
+    """
+    if not isinstance(payload, dict):
+        raise MessageValidationError("expected a JSON object")
+
+    phone = payload.get("phone")
+    body = payload.get("body")
+    scheduled_time_str = payload.get("scheduled_time")
+    idempotency_key = payload.get("idempotency_key") or None
+
+    # Validate required fields
+    if not phone:
+        raise MessageValidationError("phone is required")
+    if not body:
+        raise MessageValidationError("body is required")
+    if not from_number:
+        raise MessageValidationError(
+            "TWILIO_WHATSAPP_FROM environment variable is not set"
+        )
+    if not scheduled_time_str:
+        raise MessageValidationError("scheduled_time is required")
+    if idempotency_key is not None and (
+        not isinstance(idempotency_key, str) or len(idempotency_key) > 255
+    ):
+        raise MessageValidationError(
+            "idempotency_key must be a string of at most 255 characters"
+        )
+
+    # Parse scheduled_time
+    try:
+        scheduled_time = parse_scheduled_time(scheduled_time_str)
+    except Exception as e:
+        raise MessageValidationError(f"Invalid scheduled_time format: {str(e)}")
+
+    # Validate scheduled_time is in the future
+    if scheduled_time <= timezone.now():
+        raise MessageValidationError("scheduled_time must be in the future")
+
+    return {
+        "phone": phone,
+        "body": body,
+        "from_number": from_number,
+        "scheduled_time": scheduled_time,
+        "idempotency_key": idempotency_key,
+    }
+
+
+def iter_ndjson(stream):
+    """Yield one parsed item per non-blank line, or the JSON error for that line."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield MessageValidationError(f"Invalid JSON: {str(e)}")
+
+
+def iter_json_array(stream, read_size=64 * 1024):
+    """Yield the items of a top-level JSON array read incrementally from ``stream``.
+
+    Only one item (plus one read buffer) is held in memory at a time. A syntax
+    error in the array itself cannot be recovered from: it is yielded as a
+    MessageValidationError and iteration stops. So does an item that is still
+    unparsable after MAX_ITEM_SIZE characters.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + text_decoder.decode(chunk or b"", final=eof)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buf[pos:pos + 1] != "[":
+        yield MessageValidationError("Invalid JSON: expected an array of messages")
+        return
+    pos += 1
+
+    skip_whitespace()
+    if buf[pos:pos + 1] == "]":
+        return
+
+    while True:
+        skip_whitespace()
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            # A value ending exactly at the buffer edge may be truncated
+            if end == len(buf) and not eof:
+                raise ValueError("incomplete value")
+        except ValueError as e:
+            if eof:
+                yield MessageValidationError(f"Invalid JSON: {str(e)}")
+                return
+            if len(buf) - pos > MAX_ITEM_SIZE:
+                yield MessageValidationError(
+                    f"Invalid JSON: item exceeds {MAX_ITEM_SIZE} characters"
+                )
+                return
+            fill()
+            continue
+        pos = end
+        yield item
+
+        skip_whitespace()
+        separator = buf[pos:pos + 1]
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            yield MessageValidationError("Invalid JSON: expected ',' or ']'")
+            return
+
+
+def bulk_schedule(
+    items, from_number, chunk_size=1000, clean=clean_message, strict=False
+):
+    """Validate and insert scheduling requests in chunks.
+
+    ``items`` yields parsed request payloads (or exceptions for items that
+    failed to parse). Yields one ``(index, queued_id, error, duplicate)``
+    result per item, in input order, after the chunk containing it has been
+    written.
+    ``clean`` validates one payload, as clean_message does. If writing a
+    chunk fails (database error rather than invalid items), every item of the
+    chunk gets the error, or with ``strict`` the exception is raised before
+    any result of that chunk is yielded.
+
+    Items whose idempotency_key was already used get the id of the existing
+    message with ``duplicate`` set, and nothing is created for them; keys are
+    looked up with one query per chunk.
+    """
+    chunk = []
+
+    def flush():
+        messages = [entry for _, entry in chunk if isinstance(entry, MessageQueue)]
+        error = None
+        created = set()
+        if messages:
+            try:
+                new = _insert(messages, from_number)
+            except Exception as e:
+                if strict:
+                    raise
+                error = str(e)
+            else:
+                created = {id(msg) for msg in new}
+                schedule_delayed((msg.id, msg.scheduled_time) for msg in new)
+                cache_messages(new)
+                remember(new)
+
+        for index, entry in chunk:
+            if not isinstance(entry, MessageQueue):
+                yield index, None, entry, False
+            elif error:
+                yield index, None, error, False
+            else:
+                yield index, entry.id, None, id(entry) not in created
+        chunk.clear()
+
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            fields = clean(item, from_number)
+        except MessageValidationError as e:
+            chunk.append((index, str(e)))
+        else:
+            chunk.append(
+                (index, MessageQueue(status=MessageQueue.STATUS_PENDING, **fields))
+            )
+
+        if len(chunk) >= chunk_size:
+            yield from flush()
+
+    yield from flush()
+
+
+def _insert(messages, from_number):
+    """Insert the messages of a chunk that don't repeat an idempotency key.
+
+    Returns the messages created; repeats get the id of the message they
+    repeat. If a concurrent request inserts one of the keys between the
+    lookup and the insert, the unique constraint rejects the chunk; the keys
+    are then looked up again and only the remainder is inserted.
+    """
+    for attempt in range(2):
+        new, repeats = _deduplicate(messages, from_number)
+        try:
+            with transaction.atomic():
+                MessageQueue.objects.bulk_create(new)
+        except IntegrityError:
+            if attempt or not any(msg.idempotency_key for msg in new):
+                raise
+            # Ids of the rolled-back rows must not be reused
+            for msg in new:
+                msg.id = None
+        else:
+            for msg, original in repeats:
+                msg.id = original.id
+            return new
+
+
+def _deduplicate(messages, from_number):
+    """Split a chunk into messages to create and repeats of existing ones.
+
+    Returns (new, repeats); repeats pairs each repeated message with the one
+    whose id it takes: an existing row or an earlier item of the chunk.
+    Existing ids are filled in right away.
+    """
+    keys = {msg.idempotency_key for msg in messages if msg.idempotency_key}
+    existing = find_existing(from_number, keys) if keys else {}
+    new, repeats, first = [], [], {}
+    for msg in messages:
+        key = msg.idempotency_key
+        if key in existing:
+            msg.id = existing[key]
+        elif key in first:
+            repeats.append((msg, first[key]))
+        else:
+            if key:
+                first[key] = msg
+            new.append(msg)
+    return new, repeats
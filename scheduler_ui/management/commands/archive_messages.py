@@ -0,0 +1,139 @@
+"""
+Move old sent/failed messages out of the live MessageQueue table.
+
+Terminal rows whose processed_at is older than the retention window are
+copied to MessageArchive and deleted from MessageQueue (or only deleted with
+--delete). Rows are handled in (processed_at, id) keyset order, one small
+chunk per short transaction, so it can run next to the scheduler and workers
+without holding locks for long. With --loop it keeps running and archives
+new history every --interval seconds.
+"""
+
+import signal
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from scheduler_ui.models import MessageArchive, MessageQueue
+
+TERMINAL_STATUSES = [MessageQueue.STATUS_SENT, MessageQueue.STATUS_FAILED]
+
+
+class Command(BaseCommand):
+    help = "Archive (or delete) sent/failed messages older than the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=float,
+            default=settings.ARCHIVE_RETENTION_DAYS,
+            help="Keep messages processed within this many days "
+            "(default: ARCHIVE_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows moved per transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to pause between chunks (default: 0.05)",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete old messages instead of archiving them",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, archiving every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=300,
+            help="With --loop: seconds between passes (default: 300)",
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = max(1, options["chunk_size"])
+        self.pause = options["pause"]
+        self.delete_only = options["delete"]
+        retention = timedelta(days=options["retention_days"])
+
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
+
+        try:
+            while True:
+                self.archive_pass(timezone.now() - retention)
+                if not options["loop"] or self.stopping.wait(options["interval"]):
+                    break
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nArchiving stopped."))
+
+    def archive_pass(self, cutoff):
+        """Move every terminal message processed before ``cutoff``."""
+        action = "Deleted" if self.delete_only else "Archived"
+        started = time.monotonic()
+        moved = 0
+        cursor = Q()
+        while not self.stopping.is_set():
+            count, last = self.move_chunk(cutoff, cursor)
+            if not count:
+                break
+            moved += count
+            cursor = Q(processed_at__gt=last[0]) | Q(
+                processed_at=last[0], id__gt=last[1]
+            )
+            if self.pause:
+                time.sleep(self.pause)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {moved} message(s) processed before "
+                f"{cutoff.isoformat()} in {elapsed:.1f}s"
+            )
+        )
+        return moved
+
+    def move_chunk(self, cutoff, cursor):
+        """Archive/delete one chunk; returns (rows, last (processed_at, id))."""
+        old = (
+            MessageQueue.objects.filter(
+                status__in=TERMINAL_STATUSES, processed_at__lt=cutoff
+            )
+            .filter(cursor)
+            .order_by("processed_at", "id")
+        )
+        with transaction.atomic():
+            if self.delete_only:
+                rows = list(old.values_list("processed_at", "id")[: self.chunk_size])
+                keys = rows
+            else:
+                rows = list(
+                    old.values(*MessageArchive.COPIED_FIELDS)[: self.chunk_size]
+                )
+                keys = [(row["processed_at"], row["id"]) for row in rows]
+                MessageArchive.objects.bulk_create(
+                    [MessageArchive(**row) for row in rows]
+                )
+            if not rows:
+                return 0, None
+
+            MessageQueue.objects.filter(
+                id__in=[message_id for _, message_id in keys],
+                status__in=TERMINAL_STATUSES,
+            ).delete()
+        return len(rows), keys[-1]
@@ -0,0 +1,371 @@
+"""
+End-to-end throughput benchmark of the scheduler -> Redis -> worker pipeline.
+
+Seeds N due messages, starts a local fake Twilio (see scheduler_ui.fake_twilio)
+and runs scheduler_loop plus W worker processes against it with the
+http_stub sender backend (--mode redis), or W process_queue processes that
+claim straight from the database (--mode db). Once every seeded message is sent or failed it
+reports throughput, p50/p99 dispatch lag and worker DB queries per message,
+and saves the results as JSON so runs can be compared over time.
+
+Seeded rows use a marker from_number and are removed afterwards unless --keep
+is given. Run it against a development database and Redis.
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from scheduler_ui.fake_twilio import make_server
+from scheduler_ui.models import MessageQueue
+from scheduler_ui.redis_queue import get_redis_client
+
+SEED_FROM_NUMBER = "bench:pipeline"
+DB_QUERIES_SERIES = "whatsapp_worker_db_queries_total"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark scheduler + workers end to end against a local fake Twilio"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=["redis", "db"],
+            default="redis",
+            help="redis: scheduler_loop + worker; db: process_queue (default: redis)",
+        )
+        parser.add_argument(
+            "--messages", type=int, default=2000, help="Messages to seed (default: 2000)"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Worker or process_queue processes (default: 2)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="worker --concurrency / process_queue --threads per process "
+            "(default: 8)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="worker --batch-size per worker (default: 1); process_queue "
+            "claims at least --concurrency messages per batch",
+        )
+        parser.add_argument(
+            "--delayed",
+            action="store_true",
+            help="Run scheduler_loop in delayed queue mode",
+        )
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=50,
+            help="Mean fake Twilio latency in milliseconds (default: 50)",
+        )
+        parser.add_argument(
+            "--jitter-ms",
+            type=float,
+            default=10,
+            help="Fake Twilio latency standard deviation in ms (default: 10)",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of fake Twilio requests answered with HTTP 500 (default: 0)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=600,
+            help="Give up after this many seconds (default: 600)",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON results file (default: bench_results/pipeline-<timestamp>.json)",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded rows afterwards"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the database has live (non-benchmark) messages",
+        )
+
+    def handle(self, *args, **options):
+        live = (
+            MessageQueue.objects.filter(
+                status__in=[
+                    MessageQueue.STATUS_PENDING,
+                    MessageQueue.STATUS_ENQUEUED,
+                    MessageQueue.STATUS_PROCESSING,
+                ]
+            )
+            .exclude(from_number=SEED_FROM_NUMBER)
+            .exists()
+        )
+        if live and not options["force"]:
+            raise CommandError(
+                "The database has pending messages that the benchmark workers "
+                "would send. Use a development database or pass --force."
+            )
+
+        redis_client = get_redis_client()
+        try:
+            redis_client.ping()
+        except Exception as e:
+            raise CommandError(f"Redis connection failed: {e}")
+
+        server = make_server(
+            port=0,
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stub_url = f"http://127.0.0.1:{server.server_address[1]}/messages"
+
+        db_queries_before = self.read_db_queries(redis_client)
+        scheduled_at = self.seed(
+            redis_client, options["messages"], options["delayed"], options["mode"]
+        )
+        self.stdout.write(
+            f"Seeded {options['messages']} messages due at "
+            f"{scheduled_at.isoformat()}, stub at {stub_url}"
+        )
+
+        processes = self.start_pipeline(options, stub_url)
+        try:
+            finished = self.wait_for_completion(options["messages"], options["timeout"])
+        finally:
+            self.stop_pipeline(processes)
+            server.shutdown()
+            server.server_close()
+
+        results = self.collect_results(
+            scheduled_at, db_queries_before, self.read_db_queries(redis_client)
+        )
+        results["completed"] = finished
+        self.report(options, results)
+
+        if not options["keep"]:
+            MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).delete()
+
+    def seed(self, redis_client, count, delayed, mode):
+        # A short head start so all rows exist before the scheduler sees them
+        scheduled_at = timezone.now() + timedelta(seconds=2)
+        MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).delete()
+        chunk = 1000
+        for start in range(0, count, chunk):
+            created = MessageQueue.objects.bulk_create(
+                MessageQueue(
+                    phone=f"+1555{i:07d}",
+                    body=f"Benchmark message {i}",
+                    from_number=SEED_FROM_NUMBER,
+                    scheduled_time=scheduled_at,
+                )
+                for i in range(start, min(start + chunk, count))
+            )
+            if delayed and mode == "redis":
+                # schedule_delayed() is a no-op unless this process has
+                # DELAYED_QUEUE_ENABLED, so feed the sorted set directly
+                redis_client.zadd(
+                    settings.REDIS_DELAYED_KEY,
+                    {str(mq.id): scheduled_at.timestamp() for mq in created},
+                )
+        return scheduled_at
+
+    def start_pipeline(self, options, stub_url):
+        env = os.environ.copy()
+        env.update(
+            WHATSAPP_SENDER_BACKEND="http_stub",
+            WHATSAPP_STUB_URL=stub_url,
+            METRICS_ENABLED="True",
+        )
+        manage = [sys.executable, str(Path(settings.BASE_DIR) / "manage.py")]
+
+        if options["mode"] == "db":
+            process_queue = manage + [
+                "process_queue",
+                "--poll-interval",
+                "0.2",
+                "--threads",
+                str(options["concurrency"]),
+                "--batch-size",
+                str(max(options["batch_size"], options["concurrency"])),
+            ]
+            commands = [process_queue] * options["workers"]
+        else:
+            scheduler = manage + ["scheduler_loop", "--interval", "1"]
+            if options["delayed"]:
+                scheduler.append("--delayed")
+            worker = manage + [
+                "worker",
+                "--timeout",
+                "1",
+                "--concurrency",
+                str(options["concurrency"]),
+                "--batch-size",
+                str(options["batch_size"]),
+            ]
+            commands = [scheduler] + [worker] * options["workers"]
+
+        # Workers print a line per message; keep stderr so crashes show up
+        return [
+            subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+            for command in commands
+        ]
+
+    def stop_pipeline(self, processes):
+        # SIGINT lets workers finish in-flight sends and flush their metrics
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def wait_for_completion(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        last_report = 0.0
+        while True:
+            done = MessageQueue.objects.filter(
+                from_number=SEED_FROM_NUMBER,
+                status__in=[MessageQueue.STATUS_SENT, MessageQueue.STATUS_FAILED],
+            ).count()
+            if done >= count:
+                return True
+            if time.monotonic() >= deadline:
+                self.stdout.write(
+                    self.style.WARNING(f"Timed out with {done}/{count} messages done")
+                )
+                return False
+            if time.monotonic() - last_report >= 5:
+                self.stdout.write(f"  {done}/{count} done")
+                last_report = time.monotonic()
+            time.sleep(0.2)
+
+    def read_db_queries(self, redis_client):
+        value = redis_client.hget(settings.METRICS_REDIS_KEY, DB_QUERIES_SERIES)
+        return float(value) if value is not None else 0.0
+
+    def collect_results(self, scheduled_at, db_queries_before, db_queries_after):
+        rows = list(
+            MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).values_list(
+                "status", "scheduled_time", "processed_at"
+            )
+        )
+        sent = sum(1 for status, _, _ in rows if status == MessageQueue.STATUS_SENT)
+        failed = sum(
+            1 for status, _, _ in rows if status == MessageQueue.STATUS_FAILED
+        )
+        processed = [
+            processed_at
+            for status, _, processed_at in rows
+            if status in (MessageQueue.STATUS_SENT, MessageQueue.STATUS_FAILED)
+            and processed_at
+        ]
+        # Lag of sent messages against their (possibly retried) scheduled_time
+        lags = sorted(
+            (processed_at - scheduled_time).total_seconds()
+            for status, scheduled_time, processed_at in rows
+            if status == MessageQueue.STATUS_SENT and processed_at
+        )
+
+        elapsed = (
+            (max(processed) - scheduled_at).total_seconds() if processed else None
+        )
+        db_queries = db_queries_after - db_queries_before
+        return {
+            "messages": len(rows),
+            "sent": sent,
+            "failed": failed,
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": (
+                len(processed) / elapsed if elapsed else None
+            ),
+            "dispatch_lag_p50_seconds": percentile(lags, 50),
+            "dispatch_lag_p99_seconds": percentile(lags, 99),
+            "db_queries_per_message": (
+                db_queries / len(processed) if processed and db_queries else None
+            ),
+        }
+
+    def report(self, options, results):
+        def fmt(value, unit=""):
+            return "n/a" if value is None else f"{value:.3f}{unit}"
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{results['sent']} sent, {results['failed']} failed "
+                f"in {fmt(results['elapsed_seconds'], 's')}"
+            )
+        )
+        self.stdout.write(
+            f"  throughput:      {fmt(results['throughput_per_second'], ' msg/s')}"
+        )
+        self.stdout.write(
+            f"  dispatch lag:    p50 {fmt(results['dispatch_lag_p50_seconds'], 's')}"
+            f", p99 {fmt(results['dispatch_lag_p99_seconds'], 's')}"
+        )
+        self.stdout.write(
+            f"  DB queries/msg:  {fmt(results['db_queries_per_message'])}"
+        )
+
+        output = options["output"] or (
+            f"bench_results/pipeline-{timezone.now():%Y%m%d-%H%M%S}.json"
+        )
+        config = {
+            key: options[key]
+            for key in (
+                "mode",
+                "messages",
+                "workers",
+                "concurrency",
+                "batch_size",
+                "delayed",
+                "latency_ms",
+                "jitter_ms",
+                "error_rate",
+            )
+        }
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                {
+                    "benchmark": "pipeline",
+                    "run_at": timezone.now().isoformat(),
+                    "config": config,
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+        self.stdout.write(f"Results saved to {path}")
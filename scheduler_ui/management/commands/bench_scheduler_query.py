@@ -0,0 +1,133 @@
+"""
+Benchmark the scheduler's hot query with and without the MessageQueue indexes.
+
+Seeds N rows (mostly sent history plus a share of pending ones), then times the
+query scheduler_loop runs every tick and prints the query plan, first with the
+scheduler indexes dropped and then with them restored. Seeded rows are removed
+afterwards unless --keep is given.
+
+Run this against a development database: the indexes are briefly dropped.
+"""
+
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from scheduler_ui.models import MessageQueue
+
+SEED_FROM_NUMBER = "bench:scheduler"
+SCHEDULER_INDEXES = ("mq_status_sched_idx", "mq_live_sched_idx")
+
+
+class Command(BaseCommand):
+    help = "Seed MessageQueue rows and time the scheduler query before/after indexing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=100000, help="Rows to seed (default: 100000)"
+        )
+        parser.add_argument(
+            "--pending-ratio",
+            type=float,
+            default=0.01,
+            help="Share of seeded rows left pending (default: 0.01)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="LIMIT of the scheduler query, as in scheduler_loop (default: 1000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per measurement; the best one is reported (default: 5)",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded rows afterwards"
+        )
+
+    def handle(self, *args, **options):
+        self.seed(options["rows"], options["pending_ratio"])
+
+        now = timezone.now()
+        query = (
+            MessageQueue.objects.filter(
+                status=MessageQueue.STATUS_PENDING, scheduled_time__lte=now
+            )
+            .order_by("scheduled_time", "id")
+            .values_list("id", flat=True)[: options["batch_size"]]
+        )
+
+        indexes = [
+            index
+            for index in MessageQueue._meta.indexes
+            if index.name in SCHEDULER_INDEXES
+        ]
+        try:
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.remove_index(MessageQueue, index)
+            self.measure("without indexes", query, options["repeat"])
+        finally:
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.add_index(MessageQueue, index)
+        self.measure("with indexes", query, options["repeat"])
+
+        if not options["keep"]:
+            deleted, _ = MessageQueue.objects.filter(
+                from_number=SEED_FROM_NUMBER
+            ).delete()
+            self.stdout.write(f"Removed {deleted} seeded row(s)")
+
+    def seed(self, rows, pending_ratio):
+        """Insert ``rows`` benchmark messages spread over the last 30 days."""
+        now = timezone.now()
+        started = time.monotonic()
+        chunk_size = 5000
+        for offset in range(0, rows, chunk_size):
+            batch = []
+            for _ in range(min(chunk_size, rows - offset)):
+                scheduled_time = now - timedelta(seconds=random.randint(0, 30 * 86400))
+                pending = random.random() < pending_ratio
+                batch.append(
+                    MessageQueue(
+                        phone="+10000000000",
+                        body="benchmark",
+                        from_number=SEED_FROM_NUMBER,
+                        scheduled_time=scheduled_time,
+                        status=(
+                            MessageQueue.STATUS_PENDING
+                            if pending
+                            else MessageQueue.STATUS_SENT
+                        ),
+                        processed_at=None if pending else scheduled_time,
+                    )
+                )
+            with transaction.atomic():
+                MessageQueue.objects.bulk_create(batch)
+        self.stdout.write(
+            f"Seeded {rows} row(s) in {time.monotonic() - started:.1f}s "
+            f"(table now holds {MessageQueue.objects.count()} rows)"
+        )
+
+    def measure(self, label, query, repeat):
+        """Print the best-of-``repeat`` query time and the query plan."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(query.all())
+            timings.append(time.perf_counter() - started)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scheduler query {label}: best {min(timings) * 1000:.2f}ms, "
+                f"worst {max(timings) * 1000:.2f}ms over {repeat} run(s)"
+            )
+        )
+        self.stdout.write(query.explain())
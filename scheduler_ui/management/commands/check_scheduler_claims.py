@@ -0,0 +1,165 @@
+"""
+Check that concurrent scheduler replicas never claim the same message twice.
+
+Seeds N due pending rows, then forks R processes that each run
+scheduler_loop's claim step (claim_chunk) in a loop until nothing is left, as
+R scheduler_loop replicas would. Every seeded row must be claimed by exactly
+one replica; duplicates or missing rows make the command fail. So does a
+replica that claimed nothing, since then the claims never overlapped.
+
+Without SELECT ... FOR UPDATE SKIP LOCKED (SQLite) each claim locks the whole
+database, so the replicas run one after another and nothing concurrent is
+checked. The command then reports the result as inconclusive (exit status 2)
+instead of passing.
+
+Nothing is pushed to Redis. The claimed rows are removed afterwards. The
+command refuses to run while the database has other due pending messages,
+since the replicas would claim those too.
+"""
+
+import multiprocessing
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from scheduler_ui.management.commands.scheduler_loop import Command as SchedulerLoop
+from scheduler_ui.models import MessageQueue
+
+SEED_FROM_NUMBER = "bench:claims"
+
+
+def run_replica(batch_size, start_at, results):
+    """Claim chunks until none are left; report the claimed IDs."""
+    scheduler = SchedulerLoop()
+    scheduler.batch_size = batch_size
+    claimed = []
+    try:
+        # Line the replicas up so their claims overlap
+        time.sleep(max(0.0, start_at - time.time()))
+        while True:
+            rows = scheduler.claim_chunk(timezone.now())
+            if not rows:
+                break
+            claimed.extend(message_id for message_id, _ in rows)
+        results.put((claimed, None))
+    except Exception as e:
+        results.put((claimed, f"{type(e).__name__}: {e}"))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run concurrent scheduler claimers and check no message is claimed twice"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=20000, help="Rows to seed (default: 20000)"
+        )
+        parser.add_argument(
+            "--replicas",
+            type=int,
+            default=4,
+            help="Concurrent scheduler replicas (default: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows claimed per chunk, as scheduler_loop --batch-size "
+            "(default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        due = MessageQueue.objects.filter(
+            status=MessageQueue.STATUS_PENDING, scheduled_time__lte=timezone.now()
+        ).exclude(from_number=SEED_FROM_NUMBER)
+        if due.exists():
+            raise CommandError(
+                "The database has due pending messages that the replicas would "
+                "claim. Run this against a development database."
+            )
+
+        MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).delete()
+        now = timezone.now()
+        MessageQueue.objects.bulk_create(
+            (
+                MessageQueue(
+                    phone=f"+1555{i:07d}",
+                    body="claim check",
+                    from_number=SEED_FROM_NUMBER,
+                    scheduled_time=now,
+                )
+                for i in range(options["rows"])
+            ),
+            batch_size=1000,
+        )
+        seeded = set(
+            MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).values_list(
+                "id", flat=True
+            )
+        )
+        self.stdout.write(
+            f"Seeded {len(seeded)} rows; claiming with {options['replicas']} "
+            f"replicas on {connection.vendor} (SKIP LOCKED: "
+            f"{connection.features.has_select_for_update_skip_locked})"
+        )
+
+        # Children must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        start_at = time.time() + 0.5
+        replicas = [
+            context.Process(
+                target=run_replica, args=(options["batch_size"], start_at, results)
+            )
+            for _ in range(options["replicas"])
+        ]
+        started = time.monotonic()
+        for replica in replicas:
+            replica.start()
+        reports = [results.get() for _ in replicas]
+        for replica in replicas:
+            replica.join()
+        elapsed = time.monotonic() - started - 0.5
+
+        MessageQueue.objects.filter(from_number=SEED_FROM_NUMBER).delete()
+
+        counts = Counter(
+            message_id for claimed, _ in reports for message_id in claimed
+        )
+        duplicates = sum(1 for count in counts.values() if count > 1)
+        missing = len(seeded - counts.keys())
+        errors = [error for _, error in reports if error]
+        per_replica = ", ".join(str(len(claimed)) for claimed, _ in reports)
+        self.stdout.write(
+            f"Claimed {sum(counts.values())} rows in {elapsed:.2f}s "
+            f"(per replica: {per_replica})"
+        )
+
+        if errors:
+            raise CommandError(f"Replica errors: {'; '.join(errors)}")
+        if duplicates or missing:
+            raise CommandError(
+                f"{duplicates} row(s) claimed more than once, {missing} never claimed"
+            )
+        if not connection.features.has_select_for_update_skip_locked:
+            raise CommandError(
+                f"Inconclusive: {connection.vendor} has no SKIP LOCKED, so the "
+                f"replicas' claims were serialized rather than concurrent. Run "
+                f"this against PostgreSQL.",
+                returncode=2,
+            )
+        idle = sum(1 for claimed, _ in reports if not claimed)
+        if idle:
+            raise CommandError(
+                f"{idle} replica(s) claimed nothing, so the claims never "
+                f"overlapped. Seed more rows with --rows or lower --batch-size."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"OK: every row was claimed exactly once by {len(replicas)} replicas"
+            )
+        )
@@ -0,0 +1,76 @@
+"""
+Delete a campaign and its recipient messages in small chunks.
+
+MessageQueue.campaign is PROTECT, so a campaign with recipients can't be
+deleted from the admin: a cascade over a large broadcast would delete every
+row in one request and one transaction. This command deletes the live
+recipient rows a chunk per short transaction, then the campaign itself.
+Recipients already moved to MessageArchive are kept as history.
+
+Recipients that are being sent while the command runs are deleted too; stop
+the campaign's sends first if that matters.
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import ProtectedError
+
+from scheduler_ui.models import Campaign, MessageQueue
+
+
+class Command(BaseCommand):
+    help = "Delete a campaign and its recipient messages in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign_id", type=int, help="Campaign to delete")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Recipient rows deleted per transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to pause between chunks (default: 0.05)",
+        )
+
+    def handle(self, *args, **options):
+        campaign_id = options["campaign_id"]
+        chunk_size = max(1, options["chunk_size"])
+        if not Campaign.objects.filter(pk=campaign_id).exists():
+            raise CommandError(f"Campaign {campaign_id} does not exist")
+
+        started = time.monotonic()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    MessageQueue.objects.filter(campaign_id=campaign_id).values_list(
+                        "id", flat=True
+                    )[:chunk_size]
+                )
+                if not ids:
+                    break
+                MessageQueue.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        try:
+            Campaign.objects.filter(pk=campaign_id).delete()
+        except ProtectedError:
+            raise CommandError(
+                f"Recipients were added to campaign {campaign_id} meanwhile; "
+                f"run the command again"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted campaign {campaign_id} and {deleted} recipient "
+                f"message(s) in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,65 @@
+"""
+Run a local fake Twilio Messages API for the http_stub sender backend.
+
+Point workers at it with:
+    WHATSAPP_SENDER_BACKEND=http_stub WHATSAPP_STUB_URL=http://127.0.0.1:8765/messages
+"""
+
+from django.core.management.base import BaseCommand
+
+from scheduler_ui.fake_twilio import make_server
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Twilio API with configurable latency and error rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=100,
+            help="Mean response latency in milliseconds (default: 100)",
+        )
+        parser.add_argument(
+            "--jitter-ms",
+            type=float,
+            default=20,
+            help="Standard deviation of the latency in milliseconds (default: 20)",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests answered with HTTP 500 (default: 0)",
+        )
+        parser.add_argument(
+            "--throttle-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests answered with HTTP 429 (default: 0)",
+        )
+
+    def handle(self, *args, **options):
+        server = make_server(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            throttle_rate=options["throttle_rate"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fake Twilio listening on "
+                f"http://{options['host']}:{options['port']}/messages. "
+                f"Press Ctrl+C to stop."
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nFake Twilio stopped."))
+        finally:
+            server.server_close()
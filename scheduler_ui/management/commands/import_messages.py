@@ -0,0 +1,193 @@
+"""
+Stream a CSV or NDJSON file of messages into MessageQueue.
+
+Each record needs phone, body and scheduled_time (CSV columns or JSON keys)
+and is validated with the same rules as the trigger endpoint. Files ending in
+.gz are decompressed on the fly. Records are read one at a time and written
+with chunked bulk_create, one transaction per chunk, so memory use stays flat
+whatever the file size.
+
+With --checkpoint, the number of records already imported is written to a
+file after every chunk and read back on start, so an interrupted import can be
+re-run and continues where it stopped (--resume-from sets the offset by hand).
+The checkpoint only ever covers committed chunks: if a chunk can't be written
+(database error), the import stops there so a re-run retries it.
+
+Records without an idempotency_key get "import:<file fingerprint>:<record
+number>", so a chunk that committed just before a crash (but after the last
+checkpoint) is recognised as duplicates when re-run instead of being
+inserted twice. The fingerprint covers the file's path, size and
+modification time; within IDEMPOTENCY_KEY_TTL the same unchanged file never
+schedules a record twice.
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler_ui.ingest import bulk_schedule, default_from_number, iter_ndjson
+
+
+class Command(BaseCommand):
+    help = "Import messages from a CSV or NDJSON file (optionally gzipped)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file, optionally .gz")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="File format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Records inserted per transaction (default: 5000)",
+        )
+        parser.add_argument(
+            "--from-number",
+            default=None,
+            help="Sender number (default: TWILIO_WHATSAPP_FROM)",
+        )
+        parser.add_argument(
+            "--resume-from",
+            type=int,
+            default=None,
+            help="Skip this many records before importing",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="File recording the number of imported records, for resuming",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+
+        from_number = options["from_number"] or default_from_number()
+        if not from_number:
+            raise CommandError(
+                "TWILIO_WHATSAPP_FROM environment variable is not set "
+                "(or pass --from-number)"
+            )
+
+        file_format = options["format"] or self.guess_format(path)
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+        offset = options["resume_from"]
+        if offset is None:
+            offset = self.read_checkpoint(checkpoint)
+        batch_size = options["batch_size"]
+
+        if offset:
+            self.stdout.write(f"Resuming after record {offset}")
+
+        started = time.monotonic()
+        created = duplicates = failed = 0
+        processed = offset
+        with self.open_records(path, file_format) as records:
+            records = self.keyed_records(
+                itertools.islice(records, offset, None), path, offset
+            )
+            try:
+                for index, queued_id, error, duplicate in bulk_schedule(
+                    records, from_number, chunk_size=batch_size, strict=True
+                ):
+                    processed = offset + index + 1
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f"Record {processed}: {error}")
+                    elif duplicate:
+                        duplicates += 1
+                    else:
+                        created += 1
+
+                    # Results come back once their chunk is committed
+                    if (index + 1) % batch_size == 0:
+                        self.write_checkpoint(checkpoint, processed)
+                        self.report(created, duplicates, failed, started)
+            except Exception as e:
+                # Only committed chunks are checkpointed; the failed one is
+                # retried by the next run
+                self.write_checkpoint(checkpoint, processed)
+                self.report(created, duplicates, failed, started)
+                raise CommandError(
+                    f"Writing the records after {processed} failed: {e}. "
+                    f"Re-run to resume from there."
+                )
+
+        self.write_checkpoint(checkpoint, processed)
+        self.report(created, duplicates, failed, started, final=True)
+
+    def keyed_records(self, records, path, offset):
+        """Give every record without an idempotency_key one from its position."""
+        stat = path.stat()
+        fingerprint = hashlib.sha256(
+            f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
+        for number, record in enumerate(records, start=offset + 1):
+            if isinstance(record, dict) and not record.get("idempotency_key"):
+                record["idempotency_key"] = f"import:{fingerprint}:{number}"
+            yield record
+
+    def guess_format(self, path):
+        suffixes = [suffix for suffix in path.suffixes if suffix != ".gz"]
+        if suffixes and suffixes[-1] == ".csv":
+            return "csv"
+        if suffixes and suffixes[-1] in (".ndjson", ".jsonl"):
+            return "ndjson"
+        raise CommandError(f"Cannot guess the format of {path}, pass --format")
+
+    def open_records(self, path, file_format):
+        """Open ``path`` and return a context manager over its records."""
+        if path.suffix == ".gz":
+            raw = gzip.open(path, "rb")
+        else:
+            raw = open(path, "rb")
+
+        if file_format == "csv":
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            return _Records(text, csv.DictReader(text))
+        return _Records(raw, iter_ndjson(raw))
+
+    def read_checkpoint(self, checkpoint):
+        if checkpoint and checkpoint.exists():
+            return int(checkpoint.read_text().strip() or 0)
+        return 0
+
+    def write_checkpoint(self, checkpoint, processed):
+        if checkpoint:
+            tmp = checkpoint.with_name(checkpoint.name + ".tmp")
+            tmp.write_text(str(processed))
+            tmp.replace(checkpoint)
+
+    def report(self, created, duplicates, failed, started, final=False):
+        elapsed = time.monotonic() - started
+        total = created + duplicates + failed
+        rate = total / elapsed if elapsed > 0 else 0.0
+        line = (
+            f"{'Imported' if final else 'Progress:'} {created} created, "
+            f"{duplicates} duplicates, {failed} failed "
+            f"({rate:.0f} rows/s, {elapsed:.1f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS(line) if final else line)
+
+
+class _Records:
+    """Context manager yielding the records of an open file."""
+
+    def __init__(self, handle, records):
+        self.handle = handle
+        self.records = records
+
+    def __enter__(self):
+        return self.records
+
+    def __exit__(self, *exc_info):
+        self.handle.close()
@@ -1,69 +1,278 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils import timezone
-import os
+"""
+Database-backed queue processor: sends due messages without Redis.
+
+Claims batches of due pending messages straight from MessageQueue
+(pending -> processing, see scheduler_ui.claims), so any number of
+process_queue instances can run side by side without sending duplicates.
+Each claim carries a lease: if the process dies mid-batch, the rows are
+handed back to pending once the lease expires (or failed if they are out of
+attempts). The lease of a message is renewed right before it is sent, so
+--lease only has to cover one send, not the whole batch; a message whose
+lease was lost meanwhile is skipped, and outcomes are written only to rows
+still held under this process's lease. Messages are sent on --threads
+threads with the same retry, rate limiting and metrics as the Redis worker.
+
+Recurring schedules are materialised into messages every RECLAIM_INTERVAL
+seconds, as scheduler_loop does on each sweep.
+
+Runs continuously until Ctrl+C or SIGTERM, which drains the current batch.
+With --once it processes up to --limit due messages and exits.
+
+The status cache and metrics keep their state in Redis: if Redis doesn't
+answer at startup, both are turned off for this process. Rate limiting also
+needs Redis, so leave SENDER_RATE_LIMIT unset when running without it.
+"""
+
+import signal
+import threading
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 
+from scheduler_ui import metrics, status_cache
+from scheduler_ui.claims import claim, reclaim_expired
+from scheduler_ui.management.commands.worker import Command as WorkerCommand
 from scheduler_ui.models import MessageQueue
-from whatsapp_scheduler.actions import send_whatsapp_via_twilio
+from scheduler_ui.recurring import materialise_due
+from scheduler_ui.ratelimit import SenderRateLimiter, limiting_enabled
+from scheduler_ui.redis_queue import get_redis_client, redis_reachable
+from scheduler_ui.status_cache import cache_messages, cache_status
+from whatsapp_scheduler.actions import configure_twilio_pool
 
 logger = logging.getLogger(__name__)
 
+# Seconds between scans for expired leases and recurring schedules
+RECLAIM_INTERVAL = 30
+
 
-class Command(BaseCommand):
-    help = "Process pending MessageQueue entries and send them via WhatsApp (Twilio)"
+class Command(WorkerCommand):
+    help = "Send due MessageQueue entries straight from the database (no Redis)"
 
     def add_arguments(self, parser):
         parser.add_argument(
-            "--limit", type=int, default=10, help="Maximum messages to process"
+            "--once",
+            action="store_true",
+            help="Process up to --limit due messages and exit",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="With --once: maximum messages to process (default: 10)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Messages claimed per database round trip (default: 50)",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Sends kept in flight (default: 8)",
+        )
+        parser.add_argument(
+            "--lease",
+            type=int,
+            default=300,
+            help="Seconds a claimed message may take to send before it is "
+            "handed back to pending; renewed before each send (default: 300)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no message is due (default: 1)",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=int,
+            default=60,
+            help="Seconds between throughput reports (default: 60)",
         )
 
     def handle(self, *args, **options):
-        limit = options["limit"]
-        processed = 0
+        threads = max(1, options["threads"])
+        self.batch_size = max(1, options["batch_size"])
+        self.lease = timedelta(seconds=options["lease"])
+        self.report_interval = options["report_interval"]
+        configure_twilio_pool(threads)
 
-        qs = MessageQueue.objects.filter(status=MessageQueue.STATUS_PENDING).order_by(
-            "created_at"
-        )[:limit]
-
-        for msg in qs:
-            with transaction.atomic():
-                # mark processing
-                msg.status = MessageQueue.STATUS_PROCESSING
-                msg.attempts += 1
-                msg.save()
-
-            try:
-                # Check if from_number exists (for backward compatibility)
-                if not hasattr(msg, "from_number") or not msg.from_number:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f"Message id={msg.id} missing from_number, skipping"
-                        )
-                    )
-                    msg.status = MessageQueue.STATUS_FAILED
-                    msg.result = "Missing from_number field"
-                    msg.processed_at = timezone.now()
-                    msg.save()
-                    processed += 1
-                    continue
-
-                result = send_whatsapp_via_twilio(msg.phone, msg.body, msg.from_number)
-                msg.status = MessageQueue.STATUS_SENT
-                msg.result = str(result)
-                msg.processed_at = timezone.now()
-                msg.save()
-                self.stdout.write(
-                    self.style.SUCCESS(f"Sent id={msg.id} to {msg.phone}")
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
+
+        # The limiter keeps its buckets in Redis; without a limit configured
+        # nothing touches Redis
+        self.rate_limiter = (
+            SenderRateLimiter(get_redis_client()) if limiting_enabled() else None
+        )
+        # Likewise the status cache and metrics: rather than failing every
+        # write against a Redis that isn't there, turn them off
+        if (
+            status_cache.caching_enabled() or metrics.enabled()
+        ) and not redis_reachable():
+            status_cache.disable()
+            metrics.disable()
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Redis at {settings.REDIS_HOST}:{settings.REDIS_PORT} is "
+                    f"unreachable: status cache and metrics are disabled"
                 )
-            except Exception as exc:
-                logger.exception("Failed sending message id=%s", msg.id)
-                msg.status = MessageQueue.STATUS_FAILED
-                msg.result = str(exc)
-                msg.processed_at = timezone.now()
-                msg.save()
-                self.stdout.write(self.style.ERROR(f"Failed id={msg.id}: {exc}"))
+            )
+        metrics.instrument_db()
+        self.stats_lock = threading.Lock()
+        self.started_at = self.last_report_at = time.monotonic()
+        self.sent_count = self.failed_count = self.retried_count = 0
+        self.last_report_count = 0
 
-            processed += 1
+        executor = ThreadPoolExecutor(
+            max_workers=threads,
+            thread_name_prefix="process-queue-send",
+            initializer=metrics.instrument_db,
+        )
+        try:
+            if options["once"]:
+                self.run_once(executor, options["limit"])
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Processing due messages from the database "
+                        f"(threads: {threads}, batch size: {self.batch_size}). "
+                        f"Press Ctrl+C to stop."
+                    )
+                )
+                self.run_forever(executor, options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(
+                self.style.WARNING("\nStopping, draining in-flight sends...")
+            )
+        finally:
+            executor.shutdown(wait=True)
+        self.report_throughput(final=True)
 
+    def run_once(self, executor, limit):
+        processed = 0
+        self.reclaim_expired()
+        self.materialise_recurring()
+        while processed < limit:
+            messages = self.claim_due(min(self.batch_size, limit - processed))
+            if not messages:
+                break
+            self.send_batch(messages, executor)
+            processed += len(messages)
         self.stdout.write(self.style.SUCCESS(f"Processed {processed} messages"))
+
+    def run_forever(self, executor, poll_interval):
+        next_reclaim = 0.0
+        while not self.stopping.is_set():
+            if time.monotonic() >= next_reclaim:
+                self.reclaim_expired()
+                self.materialise_recurring()
+                next_reclaim = time.monotonic() + RECLAIM_INTERVAL
+
+            self.report_throughput()
+            metrics.maybe_flush()
+
+            messages = self.claim_due(self.batch_size)
+            if messages:
+                self.send_batch(messages, executor)
+            else:
+                self.stopping.wait(poll_interval)
+        self.stdout.write(self.style.WARNING("Stopped."))
+
+    def materialise_recurring(self):
+        """Create the upcoming occurrences of recurring schedules."""
+        try:
+            created = materialise_due(batch_size=self.batch_size)
+        except Exception as e:
+            logger.exception(f"Failed to materialise recurring schedules: {e}")
+            return
+        if created:
+            self.stdout.write(f"Materialised {created} recurring message(s)")
+
+    def claim_due(self, limit):
+        """Claim up to ``limit`` due pending messages (pending -> processing)."""
+        now = timezone.now()
+        lease_expires_at = now + self.lease
+        messages = claim(
+            MessageQueue.objects.filter(
+                status=MessageQueue.STATUS_PENDING, scheduled_time__lte=now
+            ).order_by("scheduled_time", "id"),
+            limit,
+            MessageQueue.STATUS_PENDING,
+            status=MessageQueue.STATUS_PROCESSING,
+            attempts=F("attempts") + 1,
+            lease_expires_at=lease_expires_at,
+        )
+        for msg in messages:
+            msg.status = MessageQueue.STATUS_PROCESSING
+            msg.attempts += 1
+            msg.lease_expires_at = lease_expires_at
+        cache_messages(messages, "status", "attempts")
+        return messages
+
+    def send_batch(self, messages, executor):
+        """Send a claimed batch and record the outcomes we still hold a lease on."""
+        futures = [executor.submit(self.deliver, msg) for msg in messages]
+        try:
+            wait(futures)
+        finally:
+            # On Ctrl+C still let the claimed batch finish and record it
+            wait(futures)
+            attempted = [
+                msg
+                for msg, future in zip(messages, futures)
+                if future.exception() is None and future.result()
+            ]
+            self.record_outcomes(attempted)
+
+    def deliver(self, msg):
+        """Renew the lease of ``msg`` and send it.
+
+        Returns None without sending if the lease was lost in the meantime:
+        the message was reclaimed and may already be with another process.
+        """
+        if not self.renew_lease(msg):
+            logger.warning(f"Lease on message id={msg.id} lost, skipping it")
+            return None
+        return super().deliver(msg)
+
+    def renew_lease(self, msg):
+        """Extend the lease of ``msg`` if we still hold it; returns whether we do."""
+        lease_expires_at = timezone.now() + self.lease
+        renewed = MessageQueue.objects.filter(
+            id=msg.id,
+            status=MessageQueue.STATUS_PROCESSING,
+            lease_expires_at=msg.lease_expires_at,
+        ).update(lease_expires_at=lease_expires_at)
+        if renewed:
+            msg.lease_expires_at = lease_expires_at
+        return bool(renewed)
+
+    def reclaim_expired(self):
+        """Hand messages whose lease expired back to pending (or failed)."""
+        retry, exhausted = reclaim_expired()
+        if not retry and not exhausted:
+            return
+        cache_status(
+            [
+                {"id": message_id, "status": MessageQueue.STATUS_FAILED}
+                for message_id in exhausted
+            ]
+            + [
+                {"id": message_id, "status": MessageQueue.STATUS_PENDING}
+                for message_id in retry
+            ]
+        )
+        self.stdout.write(
+            self.style.WARNING(
+                f"Reclaimed expired leases: {len(retry)} requeued, "
+                f"{len(exhausted)} failed"
+            )
+        )
@@ -0,0 +1,202 @@
+"""
+Supervisor that runs the scheduler loop and a pool of workers in one command.
+
+Forks one scheduler_loop child and --workers worker children (default: one
+per CPU) from the already set-up parent, so children start with Django,
+Twilio and Redis modules imported. Children that exit or crash are restarted.
+
+SIGTERM or Ctrl+C is forwarded to the children as SIGTERM: workers finish
+their in-flight sends and the scheduler its current pass. Children ignore
+SIGINT themselves, since a terminal Ctrl+C reaches the whole process group
+and would interrupt a send halfway. Children still running after --grace
+seconds are killed; messages they were sending stay in processing until
+their PROCESSING_LEASE expires and scheduler_loop requeues them.
+"""
+
+import os
+import signal
+import sys
+import time
+import traceback
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# A child that dies sooner than this after starting is restarted with a delay,
+# so a crash on startup (e.g. Redis down) doesn't turn into a fork loop.
+MIN_CHILD_UPTIME = 5
+RESTART_DELAY = 1
+
+
+class Command(BaseCommand):
+    help = "Run scheduler_loop and a prefork pool of workers under one supervisor"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: CPU count)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="worker --concurrency for each worker (default: 1)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="worker --batch-size for each worker (default: 1)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=30,
+            help="scheduler_loop --interval (default: 30)",
+        )
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=30,
+            help="Seconds children get to drain after SIGTERM (default: 30)",
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        self.children = {}  # pid -> (name, command, kwargs)
+        self.started_at = {}  # pid -> monotonic start time
+
+        self.specs = [
+            ("scheduler", "scheduler_loop", {"interval": options["interval"]})
+        ]
+        worker_options = {
+            "concurrency": options["concurrency"],
+            "batch_size": options["batch_size"],
+        }
+        for index in range(max(1, options["workers"])):
+            self.specs.append((f"worker-{index}", "worker", worker_options))
+
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        for spec in self.specs:
+            self.spawn(*spec)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Dispatcher started: 1 scheduler, {len(self.specs) - 1} workers. "
+                f"Press Ctrl+C to stop."
+            )
+        )
+
+        while not self.stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.restart(pid, status)
+            else:
+                time.sleep(0.5)
+
+        self.drain(options["grace"])
+        self.stdout.write(self.style.WARNING("Dispatcher stopped."))
+
+    def request_stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        self.stdout.write(
+            self.style.WARNING(
+                f"\nReceived {signal.Signals(signum).name}, draining children..."
+            )
+        )
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def spawn(self, name, command, kwargs):
+        # Inherited DB connections must not be shared with the child
+        connections.close_all()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (name, command, kwargs)
+            self.started_at[pid] = time.monotonic()
+            if self.stopping:
+                # The stop signal arrived while forking
+                os.kill(pid, signal.SIGTERM)
+            return pid
+
+        # Child: ignore SIGINT (Ctrl+C reaches the whole process group; the
+        # parent forwards it as SIGTERM), default SIGTERM handling (the
+        # command installs its own handler), run the command and never return
+        # to the parent's code path.
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            call_command(command, **kwargs)
+        except KeyboardInterrupt:
+            pass
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def restart(self, pid, status):
+        spec = self.children.pop(pid, None)
+        started = self.started_at.pop(pid, None)
+        if spec is None:
+            return
+
+        name = spec[0]
+        self.stdout.write(
+            self.style.WARNING(
+                f"{name} (pid {pid}) exited with status "
+                f"{os.waitstatus_to_exitcode(status)}"
+            )
+        )
+        if self.stopping:
+            return
+
+        if started is not None and time.monotonic() - started < MIN_CHILD_UPTIME:
+            time.sleep(RESTART_DELAY)
+            if self.stopping:
+                return
+        new_pid = self.spawn(*spec)
+        self.stdout.write(
+            self.style.WARNING(f"Restarted {name} (pid {pid} -> {new_pid})")
+        )
+
+    def drain(self, grace):
+        """Wait up to ``grace`` seconds for children to exit, then kill them."""
+        deadline = time.monotonic() + grace
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.restart(pid, status)
+            else:
+                time.sleep(0.1)
+
+        for pid, (name, _, _) in list(self.children.items()):
+            self.stdout.write(
+                self.style.ERROR(f"{name} (pid {pid}) did not drain in time, killing it")
+            )
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
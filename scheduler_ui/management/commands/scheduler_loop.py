@@ -1,18 +1,53 @@
 """
 Scheduler loop that runs every 30 seconds.
 Finds messages where scheduled_time <= now AND status = 'pending',
-pushes their IDs to Redis queue, and updates status to 'enqueued'.
+claims them in chunks (status -> 'enqueued') with a single conditional UPDATE
+and pushes each chunk's IDs to their Redis queue shards (by from_number) in
+one MULTI/EXEC round trip.
+
+With DELAYED_QUEUE_ENABLED (or --delayed) the loop instead sleeps until the
+earliest entry of the Redis delayed queue is due and dispatches it on time;
+the database scan then only runs every --interval seconds as a
+reconciliation sweep for messages the delayed queue missed.
+
+Several replicas can run side by side: claiming locks the selected rows with
+SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so replicas
+split the due set instead of enqueuing the same rows twice.
+
+Each database sweep also materialises recurring schedules due within
+RECURRING_LOOKAHEAD seconds into pending messages (see scheduler_ui.recurring)
+and hands messages pushed more than ENQUEUED_STALE_AFTER seconds ago, whose
+shard list has since emptied, back to pending, so IDs lost from Redis (e.g.
+after REDIS_QUEUE_SHARDS changed) are pushed again. Messages left in 'processing' by a worker that died mid-send
+go back to pending once their PROCESSING_LEASE expires.
+
+SIGTERM stops the loop between passes, like Ctrl+C.
 """
 
+import signal
+import threading
 import time
 import logging
+from collections import defaultdict
+from datetime import timedelta
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.conf import settings
 import redis
 
+from scheduler_ui import metrics
+from scheduler_ui.claims import claim, reclaim_expired
 from scheduler_ui.models import MessageQueue
+from scheduler_ui.recurring import materialise_due
+from scheduler_ui.redis_queue import (
+    next_due_timestamp,
+    pop_due,
+    queue_key,
+    queue_keys,
+    shard_for,
+)
+from scheduler_ui.status_cache import cache_status
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +62,33 @@ class Command(BaseCommand):
             default=30,
             help="Interval in seconds between scheduler runs (default: 30)",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of messages claimed and pushed per chunk (default: 1000)",
+        )
+        parser.add_argument(
+            "--delayed",
+            action="store_true",
+            default=settings.DELAYED_QUEUE_ENABLED,
+            help="Dispatch from the Redis delayed queue and use --interval only "
+            "for the reconciliation sweep (default: DELAYED_QUEUE_ENABLED)",
+        )
+        parser.add_argument(
+            "--max-sleep",
+            type=float,
+            default=0.5,
+            help="Delayed mode: longest sleep between delayed queue checks, which "
+            "bounds how late a newly added earlier message can be (default: 0.5)",
+        )
 
     def handle(self, *args, **options):
         interval = options["interval"]
+        self.batch_size = options["batch_size"]
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
 
         # Connect to Redis
         try:
@@ -50,6 +109,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Failed to connect to Redis: {e}"))
             return
 
+        if options["delayed"]:
+            self.run_delayed(redis_client, interval, options["max_sleep"])
+            return
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"Starting scheduler loop (interval: {interval}s). Press Ctrl+C to stop."
@@ -57,41 +120,266 @@ class Command(BaseCommand):
         )
 
         try:
-            while True:
-                now = timezone.now()
-
-                # Find messages ready to be sent
-                ready_messages = MessageQueue.objects.filter(
-                    status=MessageQueue.STATUS_PENDING, scheduled_time__lte=now
-                ).order_by("scheduled_time")
-
-                enqueued_count = 0
-                for msg in ready_messages:
-                    try:
-                        with transaction.atomic():
-                            # Update status to enqueued
-                            msg.status = MessageQueue.STATUS_ENQUEUED
-                            msg.save()
-
-                            # Push to Redis queue
-                            redis_client.lpush(settings.REDIS_QUEUE_KEY, str(msg.id))
-                            enqueued_count += 1
-                            self.stdout.write(
-                                f"Enqueued message id={msg.id} (scheduled for {msg.scheduled_time})"
-                            )
-                    except Exception as e:
-                        logger.exception(f"Failed to enqueue message id={msg.id}: {e}")
-                        # Revert status on error
-                        msg.status = MessageQueue.STATUS_PENDING
-                        msg.save()
-
-                if enqueued_count > 0:
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Enqueued {enqueued_count} message(s)")
-                    )
-
-                # Sleep for the interval
-                time.sleep(interval)
+            while not self.stopping.is_set():
+                self.sweep(redis_client)
+
+                # Sleep for the interval (returns early on SIGTERM)
+                self.stopping.wait(interval)
+
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nScheduler loop stopped."))
+        metrics.flush()
+
+    def run_delayed(self, redis_client, interval, max_sleep):
+        """Dispatch from the delayed queue, sweeping the DB every ``interval``."""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Starting scheduler loop in delayed-queue mode "
+                f"(reconciliation sweep: {interval}s). Press Ctrl+C to stop."
+            )
+        )
+
+        next_sweep = 0.0
+        try:
+            while not self.stopping.is_set():
+                if time.monotonic() >= next_sweep:
+                    self.sweep(redis_client)
+                    next_sweep = time.monotonic() + interval
+
+                self.enqueue_delayed(redis_client)
+                metrics.maybe_flush()
+
+                # Sleep until the earliest delayed message is due, waking up at
+                # least every max_sleep seconds to notice newly added ones.
+                sleep_for = min(max_sleep, next_sweep - time.monotonic())
+                earliest = next_due_timestamp(redis_client)
+                if earliest is not None:
+                    sleep_for = min(sleep_for, earliest - time.time())
+                if sleep_for > 0:
+                    self.stopping.wait(sleep_for)
 
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("\nScheduler loop stopped."))
+        metrics.flush()
+
+    def sweep(self, redis_client):
+        """Enqueue every due pending message found by scanning the database."""
+        started = time.monotonic()
+        self.materialise_recurring()
+        self.reclaim_processing()
+        self.requeue_stale(redis_client, timezone.now())
+        enqueued_count = self.enqueue_ready(redis_client, timezone.now())
+        elapsed = time.monotonic() - started
+        metrics.observe("whatsapp_scheduler_tick_seconds", elapsed)
+        metrics.maybe_flush()
+
+        if enqueued_count > 0:
+            rate = enqueued_count / elapsed if elapsed > 0 else 0.0
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Enqueued {enqueued_count} message(s) in {elapsed:.2f}s "
+                    f"({rate:.0f} msg/s)"
+                )
+            )
+
+    def materialise_recurring(self):
+        """Create the upcoming occurrences of recurring schedules."""
+        try:
+            created = materialise_due(batch_size=self.batch_size)
+        except Exception as e:
+            logger.exception(f"Failed to materialise recurring schedules: {e}")
+            return
+        if created:
+            self.stdout.write(f"Materialised {created} recurring message(s)")
+
+    def reclaim_processing(self):
+        """Requeue messages whose worker died before recording an outcome."""
+        try:
+            retry, exhausted = reclaim_expired()
+        except Exception as e:
+            logger.exception(f"Failed to reclaim expired leases: {e}")
+            return
+        if not retry and not exhausted:
+            return
+        cache_status(
+            [
+                {"id": message_id, "status": MessageQueue.STATUS_FAILED}
+                for message_id in exhausted
+            ]
+            + [
+                {"id": message_id, "status": MessageQueue.STATUS_PENDING}
+                for message_id in retry
+            ]
+        )
+        self.stdout.write(
+            self.style.WARNING(
+                f"Reclaimed expired leases: {len(retry)} requeued, "
+                f"{len(exhausted)} failed"
+            )
+        )
+
+    def requeue_stale(self, redis_client, now):
+        """Hand messages whose ID was lost from Redis back to pending.
+
+        A row counts as lost when it was pushed more than
+        ENQUEUED_STALE_AFTER seconds ago and the list of its current shard is
+        empty: its ID can't still be waiting there, so it was dropped (Redis
+        flushed) or left in a list no longer read (REDIS_QUEUE_SHARDS
+        changed). Rows behind a backlog are left alone, so a slow queue is
+        never pushed twice. Rows enqueued before enqueued_at existed are
+        judged by their scheduled_time.
+        """
+        if settings.ENQUEUED_STALE_AFTER <= 0:
+            return
+        cutoff = now - timedelta(seconds=settings.ENQUEUED_STALE_AFTER)
+        stale = MessageQueue.objects.filter(
+            Q(enqueued_at__lte=cutoff)
+            | Q(enqueued_at__isnull=True, scheduled_time__lte=cutoff),
+            status=MessageQueue.STATUS_ENQUEUED,
+        ).order_by("id")
+        released = 0
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key in queue_keys():
+                pipe.llen(key)
+            empty = {
+                key for key, length in zip(queue_keys(), pipe.execute()) if not length
+            }
+            last_id = 0
+            while empty:
+                rows = list(
+                    stale.filter(id__gt=last_id).values_list("id", "from_number")[
+                        : self.batch_size
+                    ]
+                )
+                ids = [
+                    message_id
+                    for message_id, from_number in rows
+                    if queue_key(shard_for(from_number)) in empty
+                ]
+                if ids:
+                    self.release_chunk(ids)
+                    released += len(ids)
+                if len(rows) < self.batch_size:
+                    break
+                last_id = rows[-1][0]
+        except Exception as e:
+            logger.exception(f"Failed to requeue stale enqueued messages: {e}")
+        if released:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Requeued {released} message(s) stuck in enqueued for over "
+                    f"{settings.ENQUEUED_STALE_AFTER}s"
+                )
+            )
+
+    def enqueue_delayed(self, redis_client):
+        """Move due members of the delayed queue onto the work queue.
+
+        IDs are popped from the sorted set atomically, then claimed in the
+        database like a regular chunk so rows already enqueued by a sweep are
+        skipped. If the push fails the rows go back to pending and the next
+        reconciliation sweep picks them up.
+        """
+        enqueued_count = 0
+        while True:
+            due_ids = pop_due(redis_client, time.time(), self.batch_size)
+            if not due_ids:
+                break
+
+            rows = self.claim_chunk(timezone.now(), ids=due_ids)
+            if rows:
+                try:
+                    self.push_chunk(redis_client, rows)
+                except Exception as e:
+                    logger.exception(f"Failed to enqueue {len(rows)} message(s): {e}")
+                    self.release_chunk([message_id for message_id, _ in rows])
+                    break
+                enqueued_count += len(rows)
+
+            if len(due_ids) < self.batch_size:
+                break
+
+        if enqueued_count > 0:
+            self.stdout.write(
+                f"Enqueued {enqueued_count} delayed message(s) on schedule"
+            )
+        return enqueued_count
+
+    def enqueue_ready(self, redis_client, now):
+        """Claim and push every message due at ``now``, one chunk at a time.
+
+        Returns the number of messages pushed to Redis.
+        """
+        enqueued_count = 0
+        while True:
+            rows = self.claim_chunk(now)
+            if not rows:
+                break
+
+            ids = [message_id for message_id, _ in rows]
+            try:
+                self.push_chunk(redis_client, rows)
+            except Exception as e:
+                logger.exception(f"Failed to enqueue {len(ids)} message(s): {e}")
+                self.release_chunk(ids)
+                break
+
+            enqueued_count += len(ids)
+            self.stdout.write(
+                f"Enqueued {len(ids)} message(s) (ids {ids[0]}..{ids[-1]})"
+            )
+
+            if len(ids) < self.batch_size:
+                break
+
+        return enqueued_count
+
+    def claim_chunk(self, now, ids=None):
+        """Move up to ``batch_size`` due messages from pending to enqueued.
+
+        If ``ids`` is given, only those messages are considered. Returns the
+        claimed (id, from_number) rows in scheduled_time order.
+
+        Safe to run from several replicas at once (see scheduler_ui.claims).
+        """
+        ready = MessageQueue.objects.filter(
+            status=MessageQueue.STATUS_PENDING, scheduled_time__lte=now
+        )
+        if ids is not None:
+            ready = ready.filter(id__in=ids)
+        return claim(
+            ready.order_by("scheduled_time", "id").values_list("id", "from_number"),
+            self.batch_size,
+            MessageQueue.STATUS_PENDING,
+            status=MessageQueue.STATUS_ENQUEUED,
+            enqueued_at=timezone.now(),
+        )
+
+    def release_chunk(self, ids):
+        """Hand a claimed chunk back to pending so a later tick retries it."""
+        MessageQueue.objects.filter(
+            id__in=ids, status=MessageQueue.STATUS_ENQUEUED
+        ).update(status=MessageQueue.STATUS_PENDING)
+        cache_status(
+            {"id": message_id, "status": MessageQueue.STATUS_PENDING}
+            for message_id in ids
+        )
+
+    def push_chunk(self, redis_client, rows):
+        """Push (id, from_number) rows to their queue shards in one MULTI/EXEC."""
+        shards = defaultdict(list)
+        for message_id, from_number in rows:
+            shards[queue_key(shard_for(from_number))].append(str(message_id))
+
+        pipe = redis_client.pipeline(transaction=True)
+        for key, values in shards.items():
+            # Workers BLPOP from the head, so push reversed to have the
+            # earliest scheduled message popped first.
+            pipe.lpush(key, *reversed(values))
+        pipe.execute()
+        metrics.inc("whatsapp_scheduler_enqueued_total", len(rows))
+        cache_status(
+            {"id": message_id, "status": MessageQueue.STATUS_ENQUEUED}
+            for message_id, _ in rows
+        )
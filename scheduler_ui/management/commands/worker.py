@@ -1,21 +1,56 @@
 """
 Worker that pops message IDs from Redis queue and sends them via Twilio.
-Updates DB status to 'sent' on success or 'failed' on error.
+Updates DB status to 'sent' on success or 'failed' on error. Transient
+errors are retried later: the message goes back to 'pending' with its
+scheduled_time pushed forward (see scheduler_ui.retry).
+
+With --concurrency N the worker keeps up to N Twilio sends in flight on a
+bounded thread pool; the main thread keeps popping and claiming messages
+while sends are running. Ctrl+C or SIGTERM stops popping and drains in-flight
+sends.
+
+With --batch-size K the worker pops up to K IDs at once, loads and claims
+them with single queries and records all outcomes with one bulk UPDATE.
+
+Every claim carries a PROCESSING_LEASE lease. A worker killed mid-send leaves
+its rows in processing; scheduler_loop hands them back to pending once the
+lease expires, and outcomes are only recorded on rows still held under the
+worker's own lease.
+
+With REDIS_QUEUE_SHARDS > 1 the worker pops from every shard (or the ones
+given with --shards), rotating which shard BLPOP checks first so a shard
+filled by one large campaign doesn't starve the others.
 """
 
+import random
+import signal
+import threading
 import time
 import logging
-from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 import redis
 
+from scheduler_ui import metrics
+from scheduler_ui.campaigns import message_body
+from scheduler_ui.claims import claim
 from scheduler_ui.models import MessageQueue
-from whatsapp_scheduler.actions import send_whatsapp_via_twilio
+from scheduler_ui.ratelimit import SenderRateLimiter, is_throttled
+from scheduler_ui.redis_queue import queue_key, schedule_delayed
+from scheduler_ui.retry import retry_delay, should_retry
+from scheduler_ui.status_cache import cache_messages
+from whatsapp_scheduler.actions import configure_twilio_pool, send_whatsapp
 
 logger = logging.getLogger(__name__)
 
+# Fields changed by a send attempt
+OUTCOME_FIELDS = ["status", "result", "processed_at", "scheduled_time"]
+
 
 class Command(BaseCommand):
     help = "Worker that processes messages from Redis queue and sends via Twilio"
@@ -27,9 +62,54 @@ class Command(BaseCommand):
             default=5,
             help="Redis BLPOP timeout in seconds (default: 5)",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of Twilio sends kept in flight (default: 1)",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=int,
+            default=60,
+            help="Seconds between throughput reports (default: 60)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="Message IDs popped and claimed per round trip (default: 1)",
+        )
+        parser.add_argument(
+            "--shards",
+            help="Comma-separated queue shards to pop from (default: all "
+            "REDIS_QUEUE_SHARDS shards)",
+        )
 
     def handle(self, *args, **options):
         timeout = options["timeout"]
+        concurrency = max(1, options["concurrency"])
+        self.report_interval = options["report_interval"]
+        shards = range(settings.REDIS_QUEUE_SHARDS)
+        if options["shards"]:
+            try:
+                shards = [int(shard) for shard in options["shards"].split(",")]
+            except ValueError:
+                raise CommandError("--shards must be comma-separated integers")
+            if not all(0 <= shard < settings.REDIS_QUEUE_SHARDS for shard in shards):
+                raise CommandError(
+                    f"--shards must be between 0 and {settings.REDIS_QUEUE_SHARDS - 1}"
+                )
+        self.queue_keys = [queue_key(shard) for shard in shards]
+        # Start the rotation at a random shard so workers don't all favour one
+        self.next_queue = random.randrange(len(self.queue_keys))
+        configure_twilio_pool(concurrency)
+
+        # SIGTERM (run_dispatcher, container stop) lets the current message or
+        # batch finish; the loop exits at its next pop, within --timeout
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stopping.set())
 
         # Connect to Redis
         try:
@@ -52,65 +132,394 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Worker started. Waiting for messages from queue "{settings.REDIS_QUEUE_KEY}". Press Ctrl+C to stop.'
+                f'Worker started (concurrency: {concurrency}). Waiting for messages from queue "{", ".join(self.queue_keys)}". Press Ctrl+C to stop.'
             )
         )
 
-        try:
-            while True:
-                # Blocking pop from Redis queue (waits up to timeout seconds)
-                result = redis_client.blpop(settings.REDIS_QUEUE_KEY, timeout=timeout)
+        self.rate_limiter = SenderRateLimiter(redis_client)
+        metrics.instrument_db()
+        self.stats_lock = threading.Lock()
+        self.started_at = self.last_report_at = time.monotonic()
+        self.sent_count = self.failed_count = self.retried_count = 0
+        self.last_report_count = 0
 
-                if result is None:
-                    # Timeout - no message available, continue loop
-                    continue
+        if options["batch_size"] > 1:
+            self.run_batches(redis_client, timeout, concurrency, options["batch_size"])
+            return
 
-                # result is a tuple: (queue_name, message_id)
-                queue_name, message_id_str = result
-                message_id = int(message_id_str)
+        if concurrency > 1:
+            self.run_concurrent(redis_client, timeout, concurrency)
+            return
 
-                try:
-                    # Get the message from database
-                    msg = MessageQueue.objects.get(
-                        id=message_id, status=MessageQueue.STATUS_ENQUEUED
-                    )
-                except MessageQueue.DoesNotExist:
-                    logger.warning(
-                        f"Message id={message_id} not found or not in enqueued status"
-                    )
+        try:
+            while not self.stopping.is_set():
+                message_id = self.pop_message_id(redis_client, timeout)
+                if message_id is None:
                     continue
 
-                # Mark as processing
-                with transaction.atomic():
-                    msg.status = MessageQueue.STATUS_PROCESSING
-                    msg.attempts += 1
-                    msg.save()
+                msg = self.claim_message(message_id)
+                if msg is not None:
+                    self.send_message(msg)
 
-                # Send the message
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.WARNING("\nWorker stopped."))
+        self.report_throughput(final=True)
+
+    def run_concurrent(self, redis_client, timeout, concurrency):
+        """Keep up to ``concurrency`` sends in flight on a thread pool."""
+        # A slot is taken before popping, so the worker never holds more
+        # claimed messages than it can start sending right away.
+        slots = threading.BoundedSemaphore(concurrency)
+        executor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix="worker-send",
+            initializer=metrics.instrument_db,
+        )
+
+        try:
+            while not self.stopping.is_set():
+                slots.acquire()
+                message_id = self.pop_message_id(redis_client, timeout)
+                msg = None
                 try:
-                    result_sid = send_whatsapp_via_twilio(
-                        msg.phone, msg.body, msg.from_number
-                    )
-                    with transaction.atomic():
-                        msg.status = MessageQueue.STATUS_SENT
-                        msg.result = str(result_sid)
-                        msg.processed_at = timezone.now()
-                        msg.save()
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Sent message id={msg.id} to {msg.phone} (sid: {result_sid})"
-                        )
-                    )
-                except Exception as exc:
-                    logger.exception(f"Failed sending message id={msg.id}")
-                    with transaction.atomic():
-                        msg.status = MessageQueue.STATUS_FAILED
-                        msg.result = str(exc)
-                        msg.processed_at = timezone.now()
-                        msg.save()
-                    self.stdout.write(
-                        self.style.ERROR(f"Failed message id={msg.id}: {exc}")
-                    )
+                    msg = self.claim_message(message_id) if message_id else None
+                    if msg is None:
+                        slots.release()
+                        continue
+                    future = executor.submit(self.send_message, msg)
+                except BaseException:
+                    # Ctrl+C between claim and submit: don't strand the row
+                    slots.release()
+                    if msg is not None:
+                        self.record_unfinished(msg)
+                    raise
+
+                future.add_done_callback(
+                    lambda future, msg=msg: self.send_done(slots, msg, future)
+                )
+
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.WARNING("\nStopping worker, draining in-flight sends...")
+        )
+        executor.shutdown(wait=True)
+        self.stdout.write(self.style.WARNING("Worker stopped."))
+        self.report_throughput(final=True)
+
+    def run_batches(self, redis_client, timeout, concurrency, batch_size):
+        """Pop, claim, send and record messages ``batch_size`` at a time."""
+        executor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix="worker-send",
+            initializer=metrics.instrument_db,
+        )
+
+        try:
+            while not self.stopping.is_set():
+                message_ids = self.pop_message_ids(redis_client, timeout, batch_size)
+                if not message_ids:
+                    continue
+
+                messages = self.claim_batch(message_ids)
+                if messages:
+                    self.send_batch(messages, executor)
 
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("\nWorker stopped."))
+        finally:
+            executor.shutdown(wait=True)
+        self.report_throughput(final=True)
+
+    def pop_message_ids(self, redis_client, timeout, count):
+        """Block for one message ID, then grab up to ``count - 1`` more.
+
+        The extra IDs come from the same shard as the first one.
+        """
+        popped = self.pop_next(redis_client, timeout)
+        if popped is None:
+            return []
+
+        queue_name, first_id = popped
+        rest = redis_client.lpop(queue_name, count - 1) or []
+        return [first_id] + [int(message_id) for message_id in rest]
+
+    def claim_batch(self, message_ids):
+        """Load enqueued messages with one query and mark them processing.
+
+        Only the rows this worker's conditional UPDATE moved are returned
+        (see scheduler_ui.claims); IDs that are gone, no longer enqueued or
+        claimed by another process in between are skipped.
+        """
+        messages = self.claim_enqueued(message_ids)
+        if len(messages) < len(message_ids):
+            logger.warning(
+                f"{len(message_ids) - len(messages)} message(s) not found or "
+                f"not in enqueued status"
+            )
+        if not messages:
+            return []
+
+        cache_messages(messages, "status", "attempts")
+        return messages
+
+    def send_batch(self, messages, executor):
+        """Send a claimed batch on the pool and record outcomes in one UPDATE."""
+        futures = [executor.submit(self.deliver, msg) for msg in messages]
+        try:
+            wait(futures)
+        finally:
+            # On Ctrl+C still let the claimed batch finish and record it
+            wait(futures)
+            recorded = self.record_outcomes(messages)
+            schedule_delayed(
+                (msg.id, msg.scheduled_time)
+                for msg in recorded
+                if msg.status == MessageQueue.STATUS_PENDING
+            )
+
+    def record_outcomes(self, messages):
+        """Write outcomes in one UPDATE, skipping rows whose lease we lost.
+
+        A row whose lease expired was handed back to pending by
+        reclaim_expired() and may have been claimed again; it belongs to its
+        new holder, so our (older) outcome must not overwrite it. Returns the
+        messages recorded.
+        """
+        if not messages:
+            return []
+        leases = {msg.id: msg.lease_expires_at for msg in messages}
+        with transaction.atomic():
+            held = MessageQueue.objects.select_for_update().filter(
+                id__in=list(leases), status=MessageQueue.STATUS_PROCESSING
+            )
+            held_ids = {
+                message_id
+                for message_id, lease_expires_at in held.values_list(
+                    "id", "lease_expires_at"
+                )
+                if leases[message_id] == lease_expires_at
+            }
+            recorded = [msg for msg in messages if msg.id in held_ids]
+            MessageQueue.objects.bulk_update(recorded, OUTCOME_FIELDS)
+
+        lost = len(messages) - len(recorded)
+        if lost:
+            logger.warning(
+                f"Lease lost on {lost} message(s) before their outcome was "
+                f"recorded; left to the process that reclaimed them"
+            )
+        cache_messages(recorded, *OUTCOME_FIELDS)
+        return recorded
+
+    def pop_message_id(self, redis_client, timeout):
+        """Blocking pop of the next message ID, or None on timeout."""
+        popped = self.pop_next(redis_client, timeout)
+        return popped[1] if popped else None
+
+    def pop_next(self, redis_client, timeout):
+        """Blocking pop of ``(queue_name, message_id)``, or None on timeout."""
+        self.report_throughput()
+        metrics.maybe_flush()
+
+        # BLPOP takes from the first non-empty key, so rotate the key order to
+        # give every shard its turn at the front.
+        keys = self.queue_keys[self.next_queue :] + self.queue_keys[: self.next_queue]
+        self.next_queue = (self.next_queue + 1) % len(self.queue_keys)
+
+        # Blocking pop from Redis queue (waits up to timeout seconds)
+        result = redis_client.blpop(keys, timeout=timeout)
+
+        if result is None:
+            # Timeout - no message available
+            return None
+
+        # result is a tuple: (queue_name, message_id)
+        queue_name, message_id_str = result
+        return queue_name, int(message_id_str)
+
+    def claim_message(self, message_id):
+        """Load an enqueued message and mark it as processing.
+
+        Returns None if the message is gone, not in enqueued status or was
+        claimed by another process first.
+        """
+        claimed = self.claim_enqueued([message_id])
+        if not claimed:
+            logger.warning(
+                f"Message id={message_id} not found or not in enqueued status"
+            )
+            return None
+
+        msg = claimed[0]
+        cache_messages([msg], "status", "attempts")
+        return msg
+
+    def claim_enqueued(self, message_ids):
+        """Move enqueued messages to processing; returns the rows we claimed.
+
+        Each claim carries a PROCESSING_LEASE lease: if this worker dies
+        before recording the outcome, scheduler_loop reclaims the row.
+        """
+        lease_expires_at = timezone.now() + timedelta(
+            seconds=settings.PROCESSING_LEASE
+        )
+        messages = claim(
+            MessageQueue.objects.filter(
+                id__in=message_ids, status=MessageQueue.STATUS_ENQUEUED
+            ).order_by("id"),
+            len(message_ids),
+            MessageQueue.STATUS_ENQUEUED,
+            status=MessageQueue.STATUS_PROCESSING,
+            attempts=F("attempts") + 1,
+            lease_expires_at=lease_expires_at,
+        )
+        for msg in messages:
+            msg.status = MessageQueue.STATUS_PROCESSING
+            msg.attempts += 1
+            msg.lease_expires_at = lease_expires_at
+        return messages
+
+    def send_message(self, msg):
+        """Send a claimed message and record the outcome on its row."""
+        outcome = self.deliver(msg)
+        if self.record_outcomes([msg]) and outcome == MessageQueue.STATUS_PENDING:
+            schedule_delayed([(msg.id, msg.scheduled_time)])
+
+    def send_done(self, slots, msg, future):
+        """Done callback of a concurrent send: free its slot, repair a failure."""
+        slots.release()
+        exc = future.exception()
+        if exc is not None:
+            logger.error(
+                f"Recording message id={msg.id} failed: {exc!r}", exc_info=exc
+            )
+            self.record_unfinished(msg)
+
+    def record_unfinished(self, msg):
+        """Best effort for a claimed message whose outcome wasn't saved.
+
+        A message that got an outcome from deliver() has it written again; one
+        that never got that far goes back to pending for the next scheduler
+        sweep. Only rows still in processing under our lease are touched; if
+        this fails too, the row is reclaimed once its lease expires.
+        """
+        if msg.status == MessageQueue.STATUS_PROCESSING:
+            msg.status = MessageQueue.STATUS_PENDING
+            msg.result = "Worker stopped before sending, requeued"
+        try:
+            MessageQueue.objects.filter(
+                id=msg.id,
+                status=MessageQueue.STATUS_PROCESSING,
+                lease_expires_at=msg.lease_expires_at,
+            ).update(**{field: getattr(msg, field) for field in OUTCOME_FIELDS})
+        except Exception:
+            logger.exception(f"Could not record message id={msg.id}")
+            return
+        cache_messages([msg], *OUTCOME_FIELDS)
+
+    def deliver(self, msg):
+        """Send a claimed message and set its outcome fields (without saving).
+
+        Returns the new status: sent, failed, or pending for a retry.
+        """
+        try:
+            # Campaign recipients are rendered from the campaign template
+            body = message_body(msg)
+            if self.rate_limiter:
+                self.rate_limiter.acquire(msg.from_number)
+            send_started = time.perf_counter()
+            try:
+                result_sid = send_whatsapp(msg.phone, body, msg.from_number)
+            finally:
+                metrics.observe(
+                    "whatsapp_twilio_request_seconds",
+                    time.perf_counter() - send_started,
+                )
+            msg.status = MessageQueue.STATUS_SENT
+            msg.result = str(result_sid)
+            msg.processed_at = timezone.now()
+            metrics.observe(
+                "whatsapp_dispatch_lag_seconds",
+                (msg.processed_at - msg.scheduled_time).total_seconds(),
+                buckets=metrics.LAG_BUCKETS,
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Sent message id={msg.id} to {msg.phone} (sid: {result_sid})"
+                )
+            )
+        except Exception as exc:
+            if is_throttled(exc) and self.rate_limiter:
+                self.rate_limiter.slow_down(msg.from_number)
+
+            if should_retry(exc, msg.attempts):
+                delay = retry_delay(msg.attempts)
+                logger.warning(
+                    f"Transient failure sending message id={msg.id}, "
+                    f"retrying in {delay:.0f}s: {exc}"
+                )
+                msg.status = MessageQueue.STATUS_PENDING
+                msg.scheduled_time = timezone.now() + timedelta(seconds=delay)
+                msg.result = f"Attempt {msg.attempts} failed, retrying: {exc}"
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Retrying message id={msg.id} in {delay:.0f}s: {exc}"
+                    )
+                )
+            else:
+                logger.exception(f"Failed sending message id={msg.id}")
+                msg.status = MessageQueue.STATUS_FAILED
+                msg.result = str(exc)
+                msg.processed_at = timezone.now()
+                self.stdout.write(
+                    self.style.ERROR(f"Failed message id={msg.id}: {exc}")
+                )
+
+        if msg.status == MessageQueue.STATUS_SENT:
+            outcome = "sent"
+        elif msg.status == MessageQueue.STATUS_FAILED:
+            outcome = "failed"
+        else:
+            outcome = "retried"
+        metrics.inc(
+            "whatsapp_messages_total", from_number=msg.from_number, outcome=outcome
+        )
+        with self.stats_lock:
+            if outcome == "sent":
+                self.sent_count += 1
+            elif outcome == "failed":
+                self.failed_count += 1
+            else:
+                self.retried_count += 1
+        return msg.status
+
+    def report_throughput(self, final=False):
+        """Print sustained msgs/sec every --report-interval seconds."""
+        now = time.monotonic()
+        if not final and now - self.last_report_at < self.report_interval:
+            return
+
+        with self.stats_lock:
+            total = self.sent_count + self.failed_count + self.retried_count
+            sent, failed = self.sent_count, self.failed_count
+            retried = self.retried_count
+
+        if final:
+            elapsed = now - self.started_at
+            done = total
+        else:
+            elapsed = now - self.last_report_at
+            done = total - self.last_report_count
+        rate = done / elapsed if elapsed > 0 else 0.0
+
+        if done or final:
+            self.stdout.write(
+                f"Throughput: {rate:.1f} msg/s over {elapsed:.0f}s "
+                f"(sent {sent}, failed {failed}, retried {retried} in total)"
+            )
+        self.last_report_at = now
+        self.last_report_count = total
+        if final:
+            metrics.flush()
@@ -0,0 +1,193 @@
+"""
+Lightweight, multiprocess-safe metrics for the scheduler and workers.
+
+Counters and histograms are accumulated in a per-process dict (a lock and a
+few float additions per observation, cheap enough for the hot loop) and
+flushed every METRICS_FLUSH_INTERVAL seconds to a Redis hash with
+HINCRBYFLOAT, which aggregates all worker processes atomically. The /metrics
+view renders that hash in the Prometheus text format, together with gauges
+read live from Redis and the database. Set METRICS_ENABLED=False to turn
+metrics off, or call disable() to turn them off in one process.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+
+from .redis_queue import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600)
+
+# name -> (type, help)
+METRICS = {
+    "whatsapp_messages_total": (
+        "counter",
+        "Send attempts by sender and outcome (sent, failed, retried)",
+    ),
+    "whatsapp_dispatch_lag_seconds": (
+        "histogram",
+        "Time between scheduled_time and the message being sent",
+    ),
+    "whatsapp_twilio_request_seconds": ("histogram", "Twilio send call latency"),
+    "whatsapp_worker_db_seconds_total": (
+        "counter",
+        "Time workers spent in database queries",
+    ),
+    "whatsapp_worker_db_queries_total": ("counter", "Database queries run by workers"),
+    "whatsapp_scheduler_enqueued_total": (
+        "counter",
+        "Messages moved to the Redis queue by the scheduler",
+    ),
+    "whatsapp_scheduler_tick_seconds": (
+        "histogram",
+        "Duration of a scheduler enqueue pass",
+    ),
+}
+
+_lock = threading.Lock()
+_pending = defaultdict(float)  # Prometheus series -> increment since last flush
+_last_flush = time.monotonic()
+_disabled = False
+
+
+def enabled():
+    """True unless METRICS_ENABLED is off or disable() was called."""
+    return settings.METRICS_ENABLED and not _disabled
+
+
+def disable():
+    """Stop recording and flushing metrics for the rest of this process."""
+    global _disabled
+    _disabled = True
+    with _lock:
+        _pending.clear()
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    rendered = ",".join(
+        '{}="{}"'.format(
+            key, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        )
+        for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{rendered}}}"
+
+
+def inc(name, amount=1, **labels):
+    """Add ``amount`` to a counter."""
+    if not enabled():
+        return
+    series = _series(name, labels)
+    with _lock:
+        _pending[series] += amount
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Record ``value`` in a histogram."""
+    if not enabled():
+        return
+    # Every bucket is touched (possibly with 0) so each one exists in Redis
+    updates = [
+        (_series(f"{name}_bucket", {**labels, "le": le}), int(value <= le))
+        for le in buckets
+    ]
+    updates.append((_series(f"{name}_bucket", {**labels, "le": "+Inf"}), 1))
+    with _lock:
+        for series, amount in updates:
+            _pending[series] += amount
+        _pending[_series(f"{name}_sum", labels)] += value
+        _pending[_series(f"{name}_count", labels)] += 1
+
+
+def maybe_flush():
+    """Flush if METRICS_FLUSH_INTERVAL has passed since the last flush."""
+    if not enabled():
+        return
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Push accumulated increments to Redis in one pipeline."""
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for series, amount in pending.items():
+            pipe.hincrbyfloat(settings.METRICS_REDIS_KEY, series, amount)
+        pipe.execute()
+    except Exception:
+        logger.warning("Failed to flush metrics", exc_info=True)
+
+
+def instrument_db():
+    """Count queries and time spent in them on this thread's DB connection."""
+    if not enabled() or getattr(connection, "_metrics_wrapped", False):
+        return
+
+    def timed_execute(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with _lock:
+                _pending["whatsapp_worker_db_seconds_total"] += elapsed
+                _pending["whatsapp_worker_db_queries_total"] += 1
+
+    connection.execute_wrappers.append(timed_execute)
+    connection._metrics_wrapped = True
+
+
+def _sort_key(series):
+    """Order series by name and labels, with histogram buckets by numeric le."""
+    name, _, labels = series.partition("{")
+    le = float("inf")
+    if 'le="' in labels:
+        bound = labels.split('le="', 1)[1].split('"', 1)[0]
+        labels = labels.replace(f'le="{bound}"', "")
+        le = float(bound)
+    return name, labels, le
+
+
+def render(gauges=()):
+    """Render stored metrics plus ``(name, help, {series: value})`` gauges."""
+    stored = get_redis_client().hgetall(settings.METRICS_REDIS_KEY)
+    by_metric = defaultdict(list)
+    for series, value in stored.items():
+        base = series.split("{", 1)[0]
+        for suffix in ("_bucket", "_sum", "_count"):
+            if base.endswith(suffix) and base[: -len(suffix)] in METRICS:
+                base = base[: -len(suffix)]
+        by_metric[base].append((series, value))
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        if name not in by_metric:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(
+            f"{series} {value}"
+            for series, value in sorted(by_metric[name], key=lambda s: _sort_key(s[0]))
+        )
+    for name, help_text, values in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(
+            f"{_series(name, labels)} {value}" for labels, value in values
+        )
+    return "\n".join(lines) + "\n"
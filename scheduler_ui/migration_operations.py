@@ -0,0 +1,77 @@
+"""
+Migration operations for indexes on the large message tables.
+
+On PostgreSQL a plain CREATE INDEX blocks writes to the table for the whole
+build, which on a MessageQueue with millions of rows stops scheduling and
+sending. These operations build the index CONCURRENTLY there instead, and
+fall back to the regular statements on other backends (development SQLite).
+
+CONCURRENTLY can't run inside a transaction: migrations using them must set
+``atomic = False``.
+"""
+
+from django.db import migrations
+
+
+def _concurrently(schema_editor):
+    return schema_editor.connection.vendor == "postgresql"
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """AddIndex, built CONCURRENTLY on PostgreSQL."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if _concurrently(schema_editor):
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if _concurrently(schema_editor):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+
+class AddConstraintConcurrently(migrations.AddConstraint):
+    """AddConstraint for a conditional UniqueConstraint, built CONCURRENTLY.
+
+    PostgreSQL enforces a conditional unique constraint with a partial unique
+    index, so it can be built like one.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not _concurrently(schema_editor):
+            schema_editor.add_constraint(model, self.constraint)
+            return
+        sql = str(self.constraint.create_sql(model, schema_editor))
+        if not sql.startswith("CREATE UNIQUE INDEX "):
+            raise ValueError(
+                f"{self.constraint.name} is not index-backed and can't be built "
+                f"concurrently"
+            )
+        schema_editor.execute(
+            sql.replace("CREATE UNIQUE INDEX ", "CREATE UNIQUE INDEX CONCURRENTLY ", 1),
+            params=None,
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not _concurrently(schema_editor):
+            schema_editor.remove_constraint(model, self.constraint)
+            return
+        schema_editor.execute(
+            f"DROP INDEX CONCURRENTLY IF EXISTS "
+            f"{schema_editor.quote_name(self.constraint.name)}"
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(fields=['status', 'scheduled_time'], name='mq_status_sched_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'enqueued'])), fields=['scheduled_time'], name='mq_live_sched_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0002_messagequeue_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(fields=['scheduled_time', 'id'], name='mq_sched_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(fields=['phone', 'scheduled_time'], name='mq_phone_sched_idx'),
+        ),
+    ]
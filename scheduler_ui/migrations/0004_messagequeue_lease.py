@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0003_messagequeue_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagequeue',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text="process_queue: when a claimed message is handed back to pending if it hasn't been sent (only meaningful while processing)", null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['lease_expires_at'], name='mq_lease_idx'),
+        ),
+    ]
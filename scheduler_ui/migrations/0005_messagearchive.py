@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0004_messagequeue_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('phone', models.CharField(max_length=32)),
+                ('body', models.TextField()),
+                ('from_number', models.CharField(max_length=32)),
+                ('scheduled_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('enqueued', 'Enqueued'), ('processing', 'Processing'), ('sent', 'Sent'), ('failed', 'Failed')], max_length=16)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['scheduled_time'],
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(condition=models.Q(('status__in', ['sent', 'failed'])), fields=['processed_at', 'id'], name='mq_done_processed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='messagearchive',
+            index=models.Index(fields=['phone', 'scheduled_time'], name='ma_phone_sched_idx'),
+        ),
+    ]
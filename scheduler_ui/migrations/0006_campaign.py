@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0005_messagearchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(help_text='Message template with {placeholder} fields')),
+                ('from_number', models.CharField(help_text='Twilio WhatsApp number (e.g., whatsapp:+1415...)', max_length=32)),
+                ('scheduled_time', models.DateTimeField(help_text='When to send the messages')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='messagearchive',
+            name='campaign_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagearchive',
+            name='variables',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagequeue',
+            name='variables',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='messagearchive',
+            index=models.Index(fields=['campaign_id', 'status'], name='ma_campaign_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='messagequeue',
+            name='campaign',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='scheduler_ui.campaign'),
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(fields=['campaign', 'status'], name='mq_campaign_status_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddConstraintConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The unique index is built CONCURRENTLY on PostgreSQL, which can't run
+    # inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0006_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagequeue',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-supplied key; a repeat request with the same key returns this message instead of scheduling another', max_length=255, null=True),
+        ),
+        AddConstraintConcurrently(
+            model_name='messagequeue',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('from_number', 'idempotency_key'), name='mq_idempotency_key_uniq'),
+        ),
+    ]
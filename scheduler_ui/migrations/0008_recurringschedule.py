@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_ui', '0007_messagequeue_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('phone', models.CharField(max_length=32)),
+                ('body', models.TextField()),
+                ('from_number', models.CharField(help_text='Twilio WhatsApp number (e.g., whatsapp:+1415...)', max_length=32)),
+                ('rrule', models.TextField(help_text='Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO;BYHOUR=9;BYMINUTE=0')),
+                ('time_zone', models.CharField(default='UTC', help_text='Time zone the rule is evaluated in (e.g., Europe/Berlin)', max_length=64)),
+                ('dtstart', models.DateTimeField(default=django.utils.timezone.now, help_text='Start of the recurrence')),
+                ('next_run_at', models.DateTimeField(blank=True, help_text='Next occurrence not yet materialised; empty once the rule ends', null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['next_run_at'], name='rs_due_idx')],
+            },
+        ),
+    ]
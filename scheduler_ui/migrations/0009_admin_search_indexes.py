@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+# PostgreSQL-only indexes for the admin search (see LargeTableAdmin): phone
+# prefix matching (LIKE 'x%' needs a pattern opclass under a non-C
+# collation) and full-text search of message bodies. Built CONCURRENTLY so
+# the live table stays writable; other backends don't need them.
+POSTGRES_INDEXES = {
+    "mq_phone_prefix_idx": "scheduler_ui_messagequeue (phone varchar_pattern_ops)",
+    "ma_phone_prefix_idx": "scheduler_ui_messagearchive (phone varchar_pattern_ops)",
+    "mq_body_fts_idx": (
+        "scheduler_ui_messagequeue USING gin (to_tsvector('simple', body))"
+    ),
+}
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, definition in POSTGRES_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        )
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0008_recurringschedule'),
+    ]
+
+    operations = [
+        # Keyset pagination of the archive listing/export; the archive can
+        # already be large here
+        AddIndexConcurrently(
+            model_name='messagearchive',
+            index=models.Index(fields=['scheduled_time', 'id'], name='ma_sched_id_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
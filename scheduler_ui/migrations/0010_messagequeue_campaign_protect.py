@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_ui', '0009_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='messagequeue',
+            name='campaign',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='scheduler_ui.campaign'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_ui', '0010_messagequeue_campaign_protect'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='messagequeue',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text="When a claimed message is handed back to pending if its outcome hasn't been recorded (only meaningful while processing)", null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on MessageQueue are built CONCURRENTLY on PostgreSQL, which
+    # can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0011_messagequeue_lease_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagequeue',
+            name='enqueued_at',
+            field=models.DateTimeField(blank=True, help_text='When scheduler_loop last pushed the message to Redis (only meaningful while enqueued)', null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(condition=models.Q(('status', 'enqueued')), fields=['enqueued_at'], name='mq_enqueued_at_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+from scheduler_ui.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes on the message tables are built CONCURRENTLY on PostgreSQL,
+    # which can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('scheduler_ui', '0012_messagequeue_enqueued_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='messagequeue',
+            index=models.Index(fields=['from_number', 'scheduled_time'], name='mq_from_sched_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='messagearchive',
+            index=models.Index(fields=['from_number', 'scheduled_time'], name='ma_from_sched_idx'),
+        ),
+    ]
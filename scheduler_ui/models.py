@@ -1,7 +1,78 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
+class Campaign(models.Model):
+    """A broadcast: one body template sent to many recipients.
+
+    Recipients are MessageQueue rows pointing at the campaign with an empty
+    body and their own ``variables``; the worker renders the template's
+    ``{placeholder}`` fields from them at send time.
+    """
+
+    name = models.CharField(max_length=200, blank=True)
+    body = models.TextField(help_text="Message template with {placeholder} fields")
+    from_number = models.CharField(
+        max_length=32, help_text="Twilio WhatsApp number (e.g., whatsapp:+1415...)"
+    )
+    scheduled_time = models.DateTimeField(help_text="When to send the messages")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Campaign(id={self.id}, name={self.name})"
+
+
+class RecurringSchedule(models.Model):
+    """A message repeated on an RFC 5545 recurrence rule (RRULE).
+
+    Occurrences are not stored up front: the scheduler materialises the ones
+    falling within a short look-ahead window into MessageQueue rows and moves
+    next_run_at forward (see scheduler_ui.recurring).
+    """
+
+    name = models.CharField(max_length=200, blank=True)
+    phone = models.CharField(max_length=32)
+    body = models.TextField()
+    from_number = models.CharField(
+        max_length=32, help_text="Twilio WhatsApp number (e.g., whatsapp:+1415...)"
+    )
+    rrule = models.TextField(
+        help_text="Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO;BYHOUR=9;BYMINUTE=0"
+    )
+    time_zone = models.CharField(
+        max_length=64,
+        default="UTC",
+        help_text="Time zone the rule is evaluated in (e.g., Europe/Berlin)",
+    )
+    dtstart = models.DateTimeField(
+        default=timezone.now, help_text="Start of the recurrence"
+    )
+    next_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Next occurrence not yet materialised; empty once the rule ends",
+    )
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # scheduler_loop: active schedules with an occurrence in the window
+            models.Index(
+                fields=["next_run_at"],
+                name="rs_due_idx",
+                condition=Q(active=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"RecurringSchedule(id={self.id}, phone={self.phone}, rrule={self.rrule})"
+
+
 class MessageQueue(models.Model):
     STATUS_PENDING = "pending"
     STATUS_ENQUEUED = "enqueued"
@@ -30,9 +101,144 @@ class MessageQueue(models.Model):
     result = models.TextField(blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     processed_at = models.DateTimeField(null=True, blank=True)
+    enqueued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When scheduler_loop last pushed the message to Redis (only "
+        "meaningful while enqueued)",
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a claimed message is handed back to pending if its "
+        "outcome hasn't been recorded (only meaningful while processing)",
+    )
+    # Campaign recipients leave body empty and are rendered from the
+    # campaign's template with their variables. A campaign with recipients
+    # can't be deleted in one go (a cascade over 200k rows would run in one
+    # transaction); the delete_campaign command removes them in chunks.
+    campaign = models.ForeignKey(
+        Campaign,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="messages",
+        db_index=False,
+    )
+    variables = models.JSONField(null=True, blank=True)
+    idempotency_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Client-supplied key; a repeat request with the same key "
+        "returns this message instead of scheduling another",
+    )
 
     class Meta:
         ordering = ["created_at"]
+        constraints = [
+            # One message per key and sender; rows without a key are not
+            # indexed
+            models.UniqueConstraint(
+                fields=["from_number", "idempotency_key"],
+                name="mq_idempotency_key_uniq",
+                condition=Q(idempotency_key__isnull=False),
+            ),
+        ]
+        indexes = [
+            # scheduler_loop: status='pending' AND scheduled_time <= now
+            # ORDER BY scheduled_time
+            models.Index(
+                fields=["status", "scheduled_time"], name="mq_status_sched_idx"
+            ),
+            # Same query restricted to live rows, so the index stays small no
+            # matter how much sent/failed history accumulates. Backends without
+            # partial index support skip it.
+            models.Index(
+                fields=["scheduled_time"],
+                name="mq_live_sched_idx",
+                condition=Q(status__in=["pending", "enqueued"]),
+            ),
+            # Keyset pagination of the listing/export APIs
+            models.Index(fields=["scheduled_time", "id"], name="mq_sched_id_idx"),
+            models.Index(fields=["phone", "scheduled_time"], name="mq_phone_sched_idx"),
+            # Admin search by sender
+            models.Index(
+                fields=["from_number", "scheduled_time"], name="mq_from_sched_idx"
+            ),
+            # scheduler_loop: enqueued rows whose ID may have been lost
+            models.Index(
+                fields=["enqueued_at"],
+                name="mq_enqueued_at_idx",
+                condition=Q(status="enqueued"),
+            ),
+            # process_queue: expired leases of processing rows
+            models.Index(
+                fields=["lease_expires_at"],
+                name="mq_lease_idx",
+                condition=Q(status="processing"),
+            ),
+            # Campaign progress counts (also serves the campaign foreign key)
+            models.Index(fields=["campaign", "status"], name="mq_campaign_status_idx"),
+            # archive_messages: oldest sent/failed rows, in keyset order
+            models.Index(
+                fields=["processed_at", "id"],
+                name="mq_done_processed_idx",
+                condition=Q(status__in=["sent", "failed"]),
+            ),
+        ]
 
     def __str__(self):
         return f"MessageQueue(id={self.id}, phone={self.phone}, status={self.status})"
+
+
+class MessageArchive(models.Model):
+    """Sent/failed MessageQueue rows moved out of the live table.
+
+    Filled by the archive_messages command; rows keep their MessageQueue id.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    phone = models.CharField(max_length=32)
+    body = models.TextField()
+    from_number = models.CharField(max_length=32)
+    scheduled_time = models.DateTimeField()
+    status = models.CharField(max_length=16, choices=MessageQueue.STATUS_CHOICES)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+    campaign_id = models.BigIntegerField(null=True, blank=True)
+    variables = models.JSONField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    # Fields copied from MessageQueue
+    COPIED_FIELDS = (
+        "id",
+        "phone",
+        "body",
+        "from_number",
+        "scheduled_time",
+        "status",
+        "attempts",
+        "result",
+        "created_at",
+        "processed_at",
+        "campaign_id",
+        "variables",
+    )
+
+    class Meta:
+        ordering = ["scheduled_time"]
+        indexes = [
+            models.Index(fields=["phone", "scheduled_time"], name="ma_phone_sched_idx"),
+            models.Index(
+                fields=["from_number", "scheduled_time"], name="ma_from_sched_idx"
+            ),
+            models.Index(fields=["campaign_id", "status"], name="ma_campaign_status_idx"),
+            # Admin changelist: scheduled_time window, newest first
+            models.Index(fields=["scheduled_time", "id"], name="ma_sched_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"MessageArchive(id={self.id}, phone={self.phone}, status={self.status})"
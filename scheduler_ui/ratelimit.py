@@ -0,0 +1,124 @@
+"""
+Per-sender token bucket shared by every worker process through Redis.
+
+Twilio throttles per sending number, so each ``from_number`` gets its own
+bucket refilled at SENDER_RATE_LIMIT tokens/second up to SENDER_RATE_BURST
+tokens (overridable per sender with SENDER_RATE_LIMITS). When Twilio answers
+429 the sender's rate is halved for SENDER_RATE_COOLDOWN seconds, and halved
+again on every further 429, so workers back off instead of burning attempts.
+"""
+
+import logging
+import time
+from django.conf import settings
+import redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = bucket hash, KEYS[2] = slowdown factor key
+# ARGV[1] = rate (tokens/s), ARGV[2] = burst
+# Returns "0" when a token was taken, otherwise the seconds to wait.
+TAKE_TOKEN_SCRIPT = """
+local factor = tonumber(redis.call('GET', KEYS[2]) or '1')
+local rate = tonumber(ARGV[1]) * factor
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+# KEYS[1] = slowdown factor key
+# ARGV[1] = lowest factor, ARGV[2] = cooldown seconds
+# Halves the factor atomically, so concurrent 429s each count; returns it.
+SLOW_DOWN_SCRIPT = """
+local factor = tonumber(redis.call('GET', KEYS[1]) or '1')
+factor = math.max(tonumber(ARGV[1]), factor / 2)
+redis.call('SET', KEYS[1], tostring(factor), 'EX', ARGV[2])
+return tostring(factor)
+"""
+
+# Lowest share of the configured rate a sender can be slowed down to
+MIN_SLOWDOWN_FACTOR = 0.05
+
+
+def limiting_enabled():
+    """True if SENDER_RATE_LIMIT or any SENDER_RATE_LIMITS entry limits sends."""
+    rates = [settings.SENDER_RATE_LIMIT]
+    rates += [rate for rate, _ in settings.SENDER_RATE_LIMITS.values()]
+    return any(rate > 0 for rate in rates)
+
+
+def is_throttled(exc):
+    """True if ``exc`` is the provider telling us to slow down (HTTP 429)."""
+    return getattr(exc, "status", None) == 429
+
+
+class SenderRateLimiter:
+    """Blocks callers until their sender's bucket has a token available."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.take_token = redis_client.register_script(TAKE_TOKEN_SCRIPT)
+        self.halve_rate = redis_client.register_script(SLOW_DOWN_SCRIPT)
+
+    def limits_for(self, from_number):
+        """Return ``(rate, burst)`` for a sender; a rate <= 0 disables limiting."""
+        return settings.SENDER_RATE_LIMITS.get(
+            from_number, (settings.SENDER_RATE_LIMIT, settings.SENDER_RATE_BURST)
+        )
+
+    def acquire(self, from_number):
+        """Wait until a send from ``from_number`` is allowed, then take a token."""
+        rate, burst = self.limits_for(from_number)
+        if rate <= 0:
+            return
+
+        keys = [f"ratelimit:{from_number}", f"ratelimit:{from_number}:slowdown"]
+        while True:
+            try:
+                wait_for = float(
+                    self.take_token(keys=keys, args=[rate, max(1, burst)])
+                )
+            except redis.RedisError:
+                # Fail open: a Redis hiccup should not fail the send itself
+                logger.warning(f"Rate limiter unavailable for {from_number}")
+                return
+            if wait_for <= 0:
+                return
+            time.sleep(min(wait_for, 1.0))
+
+    def slow_down(self, from_number):
+        """Halve the sender's rate for SENDER_RATE_COOLDOWN seconds after a 429."""
+        rate, _ = self.limits_for(from_number)
+        if rate <= 0:
+            return
+
+        try:
+            factor = float(
+                self.halve_rate(
+                    keys=[f"ratelimit:{from_number}:slowdown"],
+                    args=[MIN_SLOWDOWN_FACTOR, settings.SENDER_RATE_COOLDOWN],
+                )
+            )
+        except redis.RedisError:
+            # Like acquire(): never let the limiter fail the send's bookkeeping
+            logger.warning(f"Rate limiter unavailable for {from_number}")
+            return
+        logger.warning(
+            f"Throttled by provider for {from_number}, slowing down to "
+            f"{factor:.0%} of the configured rate"
+        )
@@ -0,0 +1,209 @@
+"""
+Recurring schedules, materialised lazily into MessageQueue rows.
+
+A RecurringSchedule stores an RRULE instead of one row per future occurrence.
+On every pass, scheduler_loop (or process_queue without Redis) calls
+materialise_due(): schedules whose next_run_at falls within
+RECURRING_LOOKAHEAD seconds get their occurrences in that window inserted
+as pending messages in bulk, and next_run_at moves past them. Storage grows
+with the number of active schedules, not with their future occurrences.
+
+Schedules are locked while they are materialised (FOR UPDATE SKIP LOCKED
+where supported) and each occurrence carries the idempotency key
+"recurring:<schedule id>:<unix time>", so concurrent schedulers never create
+an occurrence twice. Occurrences more than one window in the past (after
+downtime) are skipped rather than sent late.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dateutil.rrule import rrulestr
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .idempotency import find_existing
+from .ingest import MessageValidationError, parse_scheduled_time
+from .models import MessageQueue, RecurringSchedule
+from .redis_queue import schedule_delayed
+from .status_cache import cache_messages
+
+logger = logging.getLogger(__name__)
+
+# Occurrences of one schedule materialised per batch, so a very frequent rule
+# can't make a single pass insert an unbounded number of rows
+MAX_OCCURRENCES_PER_SCHEDULE = 100
+
+
+def build_rule(rrule, dtstart, time_zone):
+    """Parse ``rrule`` starting at ``dtstart``, evaluated in ``time_zone``.
+
+    Evaluating in the schedule's zone keeps "every day at 9:00" at 9:00 local
+    time across DST changes. Raises MessageValidationError on a bad rule.
+    """
+    try:
+        zone = ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise MessageValidationError(f"Unknown time zone: {time_zone}")
+    if "DTSTART" in rrule.upper():
+        raise MessageValidationError("rrule must not contain DTSTART; use dtstart")
+    try:
+        return rrulestr(rrule, dtstart=dtstart.astimezone(zone))
+    except (ValueError, TypeError) as e:
+        raise MessageValidationError(f"Invalid rrule: {str(e)}")
+
+
+def schedule_rule(schedule):
+    return build_rule(schedule.rrule, schedule.dtstart, schedule.time_zone)
+
+
+def first_run(schedule, now=None):
+    """The first occurrence of ``schedule`` at or after now (None if none)."""
+    start = max(schedule.dtstart, now or timezone.now())
+    return schedule_rule(schedule).after(start, inc=True)
+
+
+def clean_schedule(payload, from_number):
+    """Validate a recurring schedule request.
+
+    Returns a dict of RecurringSchedule field values including next_run_at,
+    or raises MessageValidationError.
+    """
+    if not isinstance(payload, dict):
+        raise MessageValidationError("expected a JSON object")
+
+    phone = payload.get("phone")
+    body = payload.get("body")
+    rrule = payload.get("rrule")
+    if not phone:
+        raise MessageValidationError("phone is required")
+    if not body:
+        raise MessageValidationError("body is required")
+    if not rrule or not isinstance(rrule, str):
+        raise MessageValidationError("rrule is required")
+    if not from_number:
+        raise MessageValidationError(
+            "TWILIO_WHATSAPP_FROM environment variable is not set"
+        )
+
+    dtstart = timezone.now()
+    if payload.get("dtstart"):
+        try:
+            dtstart = parse_scheduled_time(payload["dtstart"])
+        except Exception as e:
+            raise MessageValidationError(f"Invalid dtstart format: {str(e)}")
+
+    schedule = RecurringSchedule(
+        name=str(payload.get("name") or "")[:200],
+        phone=phone,
+        body=body,
+        from_number=from_number,
+        rrule=rrule,
+        time_zone=payload.get("time_zone") or "UTC",
+        dtstart=dtstart,
+    )
+    schedule.next_run_at = first_run(schedule)
+    if schedule.next_run_at is None:
+        raise MessageValidationError("rrule has no occurrences in the future")
+    return {
+        field: getattr(schedule, field)
+        for field in (
+            "name",
+            "phone",
+            "body",
+            "from_number",
+            "rrule",
+            "time_zone",
+            "dtstart",
+            "next_run_at",
+        )
+    }
+
+
+def _occurrences(schedule, start, horizon):
+    """Occurrences from ``start`` to ``horizon`` and the one following them.
+
+    Returns (due, following); following is None once the rule has ended.
+    """
+    due = []
+    for occurrence in schedule_rule(schedule).xafter(start, inc=True):
+        if occurrence > horizon or len(due) >= MAX_OCCURRENCES_PER_SCHEDULE:
+            return due, occurrence
+        due.append(occurrence)
+    return due, None
+
+
+def _occurrence_key(schedule, occurrence):
+    return f"recurring:{schedule.id}:{int(occurrence.timestamp())}"
+
+
+def _skip_existing(messages):
+    """Drop occurrences already created, e.g. before a schedule was re-enabled."""
+    keys = defaultdict(list)
+    for msg in messages:
+        keys[msg.from_number].append(msg.idempotency_key)
+    existing = set()
+    for from_number, sender_keys in keys.items():
+        existing.update(find_existing(from_number, sender_keys))
+    return [msg for msg in messages if msg.idempotency_key not in existing]
+
+
+def _materialise_batch(now, horizon, batch_size):
+    """Materialise one batch of due schedules; returns (messages, schedules)."""
+    # Occurrences older than one window were missed (scheduler down)
+    missed_before = now - (horizon - now)
+    with transaction.atomic():
+        schedules = list(
+            RecurringSchedule.objects.select_for_update(
+                skip_locked=connection.features.has_select_for_update_skip_locked
+            )
+            .filter(active=True, next_run_at__lte=horizon)
+            .order_by("next_run_at")[:batch_size]
+        )
+        messages = []
+        for schedule in schedules:
+            try:
+                due, following = _occurrences(
+                    schedule, max(schedule.next_run_at, missed_before), horizon
+                )
+            except MessageValidationError as e:
+                # The rule was edited into something invalid; stop it
+                logger.warning(f"Deactivating recurring schedule {schedule.id}: {e}")
+                due, following = [], None
+            messages.extend(
+                MessageQueue(
+                    phone=schedule.phone,
+                    body=schedule.body,
+                    from_number=schedule.from_number,
+                    scheduled_time=occurrence,
+                    status=MessageQueue.STATUS_PENDING,
+                    idempotency_key=_occurrence_key(schedule, occurrence),
+                )
+                for occurrence in due
+            )
+            schedule.next_run_at = following
+            schedule.active = following is not None
+        messages = _skip_existing(messages)
+        MessageQueue.objects.bulk_create(messages)
+        RecurringSchedule.objects.bulk_update(schedules, ["next_run_at", "active"])
+
+    schedule_delayed((msg.id, msg.scheduled_time) for msg in messages)
+    cache_messages(messages)
+    return len(messages), len(schedules)
+
+
+def materialise_due(now=None, batch_size=500):
+    """Insert the occurrences of all schedules due within the look-ahead window.
+
+    Returns the number of messages created.
+    """
+    now = now or timezone.now()
+    horizon = now + timedelta(seconds=settings.RECURRING_LOOKAHEAD)
+    created = 0
+    while True:
+        messages, schedules = _materialise_batch(now, horizon, batch_size)
+        created += messages
+        if schedules < batch_size:
+            return created
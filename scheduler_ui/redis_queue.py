@@ -0,0 +1,117 @@
+"""
+Redis helpers shared by the views and the scheduler/worker commands.
+
+Workers BLPOP message IDs from the work queue: the list ``REDIS_QUEUE_KEY``,
+or with REDIS_QUEUE_SHARDS > 1 one list per shard, chosen by a hash of the
+message's from_number. Besides that, messages can be tracked in a delayed queue: a sorted set
+(``REDIS_DELAYED_KEY``) whose members are MessageQueue IDs scored by their
+scheduled_time as a Unix timestamp. The scheduler sleeps until the earliest
+score and then pops due members with a Lua script.
+"""
+
+import logging
+import zlib
+from django.conf import settings
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+# Atomically pop up to ARGV[2] members scored <= ARGV[1] from the delayed set.
+# ZREM is issued in slices to stay under Lua's unpack() stack limit.
+POP_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for i = 1, #due, 500 do
+    redis.call('ZREM', KEYS[1], unpack(due, i, math.min(i + 499, #due)))
+end
+return due
+"""
+
+
+def get_redis_client():
+    """Return a process-wide Redis client (connections are pooled by redis-py)."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+        )
+    return _redis_client
+
+
+def redis_reachable(timeout=2):
+    """True if Redis answers a PING within ``timeout`` seconds (no retries)."""
+    client = redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        socket_connect_timeout=timeout,
+        socket_timeout=timeout,
+        retry=Retry(NoBackoff(), 0),
+    )
+    try:
+        return bool(client.ping())
+    except redis.RedisError:
+        return False
+    finally:
+        client.close()
+
+
+def queue_key(shard):
+    """Redis list of one work queue shard."""
+    if settings.REDIS_QUEUE_SHARDS == 1:
+        return settings.REDIS_QUEUE_KEY
+    return f"{settings.REDIS_QUEUE_KEY}:{shard}"
+
+
+def queue_keys():
+    """Redis lists of all work queue shards, in shard order."""
+    return [queue_key(shard) for shard in range(settings.REDIS_QUEUE_SHARDS)]
+
+
+def shard_for(from_number):
+    """Work queue shard of a sender (crc32, stable across processes)."""
+    return zlib.crc32((from_number or "").encode()) % settings.REDIS_QUEUE_SHARDS
+
+
+def schedule_delayed(messages, redis_client=None):
+    """Add ``(message_id, scheduled_time)`` pairs to the delayed queue.
+
+    Does nothing unless DELAYED_QUEUE_ENABLED is set. Failures are logged and
+    swallowed: the scheduler's reconciliation sweep still picks those rows up
+    from the database.
+    """
+    if not settings.DELAYED_QUEUE_ENABLED:
+        return
+    mapping = {
+        str(message_id): scheduled_time.timestamp()
+        for message_id, scheduled_time in messages
+    }
+    if not mapping:
+        return
+    try:
+        (redis_client or get_redis_client()).zadd(settings.REDIS_DELAYED_KEY, mapping)
+    except Exception:
+        logger.exception(
+            f"Failed to add {len(mapping)} message(s) to the delayed queue"
+        )
+
+
+def pop_due(redis_client, now_ts, limit):
+    """Pop up to ``limit`` message IDs whose score is <= ``now_ts``."""
+    script = redis_client.register_script(POP_DUE_SCRIPT)
+    due = script(keys=[settings.REDIS_DELAYED_KEY], args=[now_ts, limit])
+    return [int(message_id) for message_id in due]
+
+
+def next_due_timestamp(redis_client):
+    """Return the earliest score in the delayed queue, or None if it is empty."""
+    earliest = redis_client.zrange(settings.REDIS_DELAYED_KEY, 0, 0, withscores=True)
+    if not earliest:
+        return None
+    return earliest[0][1]
@@ -0,0 +1,43 @@
+"""
+Retry policy for failed sends.
+
+Transient failures (network errors, HTTP 429 and 5xx from Twilio) are retried
+with exponential backoff and jitter, up to SEND_MAX_ATTEMPTS attempts in
+total. A retry does not sleep in the worker: the message goes back to
+'pending' with scheduled_time pushed forward, and the scheduler enqueues it
+again once it is due. Anything else (bad number, auth error, missing
+configuration) fails permanently on the first attempt.
+"""
+
+import random
+from django.conf import settings
+import requests
+
+RETRYABLE_HTTP_STATUSES = {408, 429}
+
+
+def is_retryable(exc):
+    """True if ``exc`` looks transient and the send is worth retrying."""
+    status = getattr(exc, "status", None)
+    if status is not None:
+        return status in RETRYABLE_HTTP_STATUSES or status >= 500
+    return isinstance(
+        exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+    )
+
+
+def should_retry(exc, attempts):
+    """True if a send that failed with ``exc`` after ``attempts`` tries is retried."""
+    return attempts < settings.SEND_MAX_ATTEMPTS and is_retryable(exc)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt, after ``attempts`` tries.
+
+    The delay doubles with every attempt up to RETRY_MAX_DELAY; half of it is
+    randomised so messages failed by the same outage don't retry in lockstep.
+    """
+    delay = min(
+        settings.RETRY_MAX_DELAY, settings.RETRY_BASE_DELAY * 2 ** max(0, attempts - 1)
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
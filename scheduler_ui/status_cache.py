@@ -0,0 +1,120 @@
+"""
+Write-through cache of per-message delivery status.
+
+Every status transition (scheduler, worker, process_queue, the scheduling
+endpoints) writes the fields it changed to a Redis hash per message, with a
+TTL of STATUS_CACHE_TTL seconds. GET /messages/<id>/ answers from the hash
+and only falls back to a single primary-key query on a miss, so high
+frequency polling costs (almost) nothing on the database. The miss path
+only fills fields that are still absent (fill_status), so it never
+overwrites a newer transition cached in the meantime. Set
+STATUS_CACHE_TTL=0 to disable the cache, or call disable() to turn it off in
+one process (process_queue does when Redis is unreachable).
+"""
+
+import logging
+from django.conf import settings
+
+from .redis_queue import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELDS = ("id", "status", "attempts", "scheduled_time", "processed_at", "result")
+
+_disabled = False
+
+
+def caching_enabled():
+    """True unless STATUS_CACHE_TTL is 0 or disable() was called."""
+    return bool(settings.STATUS_CACHE_TTL) and not _disabled
+
+
+def disable():
+    """Turn the cache off for the rest of this process."""
+    global _disabled
+    _disabled = True
+
+
+def _key(message_id):
+    return f"msgstatus:{message_id}"
+
+
+def _encode(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def cache_status(entries):
+    """Write changed status fields for several messages in one round trip.
+
+    ``entries`` yields dicts holding ``id`` plus any of STATUS_FIELDS.
+    Failures are logged and ignored: the database stays the source of truth.
+    """
+    if not caching_enabled():
+        return
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for entry in entries:
+            key = _key(entry["id"])
+            pipe.hset(key, mapping={field: _encode(v) for field, v in entry.items()})
+            pipe.expire(key, settings.STATUS_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("Failed to update the message status cache", exc_info=True)
+
+
+def fill_status(entry):
+    """Fill the cache from a database read without overwriting newer fields.
+
+    Used on a cache miss: between our read and this write a worker may have
+    cached a later transition (e.g. sent), so each field is only set if it is
+    still absent (HSETNX).
+    """
+    if not caching_enabled():
+        return
+    try:
+        key = _key(entry["id"])
+        pipe = get_redis_client().pipeline(transaction=True)
+        for field, value in entry.items():
+            pipe.hsetnx(key, field, _encode(value))
+        pipe.expire(key, settings.STATUS_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("Failed to update the message status cache", exc_info=True)
+
+
+def cache_messages(messages, *fields):
+    """Write ``fields`` (default: all STATUS_FIELDS) of MessageQueue objects."""
+    fields = fields or STATUS_FIELDS
+    cache_status(
+        {"id": msg.id, **{field: getattr(msg, field) for field in fields}}
+        for msg in messages
+    )
+
+
+def get_cached_status(message_id):
+    """Return the cached status dict of a message, or None on a miss.
+
+    Entries written only partially (e.g. the row was created before the cache
+    was enabled) count as a miss.
+    """
+    if not caching_enabled():
+        return None
+    try:
+        cached = get_redis_client().hgetall(_key(message_id))
+    except Exception:
+        logger.warning("Message status cache unavailable", exc_info=True)
+        return None
+    if not all(field in cached for field in STATUS_FIELDS):
+        return None
+    return {
+        "id": int(cached["id"]),
+        "status": cached["status"],
+        "attempts": int(cached["attempts"] or 0),
+        "scheduled_time": cached["scheduled_time"],
+        "processed_at": cached["processed_at"] or None,
+        "result": cached["result"],
+    }
@@ -6,5 +6,23 @@ app_name = 'scheduler_ui'
 urlpatterns = [
     path('', views.index, name='index'),
     path('trigger/', views.trigger_action, name='trigger'),
+    path('trigger/bulk/', views.trigger_bulk, name='trigger_bulk'),
+    path('campaigns/', views.campaigns, name='campaigns'),
+    path('campaigns/<int:campaign_id>/', views.campaign_detail, name='campaign_detail'),
+    path(
+        'campaigns/<int:campaign_id>/recipients/',
+        views.campaign_recipients,
+        name='campaign_recipients',
+    ),
+    path('recurring/', views.create_recurring, name='create_recurring'),
+    path(
+        'recurring/<int:schedule_id>/',
+        views.recurring_detail,
+        name='recurring_detail',
+    ),
     path('status/', views.status, name='status'),
+    path('metrics', views.metrics, name='metrics'),
+    path('messages/', views.list_messages, name='list_messages'),
+    path('messages/export/', views.export_messages, name='export_messages'),
+    path('messages/<int:message_id>/', views.message_status, name='message_status'),
 ]
@@ -1,14 +1,43 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError
+from django.db.models import Count, Q
+from django.utils import timezone
+import base64
+import csv
+import io
 import json
-import os
+import tempfile
 
 
-from .models import MessageQueue
+from .ingest import (
+    NDJSON_CONTENT_TYPES,
+    MessageValidationError,
+    bulk_schedule,
+    clean_message,
+    default_from_number,
+    iter_json_array,
+    iter_ndjson,
+    parse_scheduled_time,
+)
+from . import idempotency
+from . import metrics as metrics_registry
+from .campaigns import add_recipients, clean_campaign, progress, with_progress
+from .models import Campaign, MessageArchive, MessageQueue, RecurringSchedule
+from .recurring import clean_schedule
+from .redis_queue import get_redis_client, queue_keys, schedule_delayed
+from .status_cache import (
+    STATUS_FIELDS,
+    cache_messages,
+    fill_status,
+    get_cached_status,
+)
 
 
 def index(request):
@@ -18,7 +47,7 @@ def index(request):
 
 @csrf_exempt
 @require_POST
-def trigger_action(request):
+async def trigger_action(request):
     """Accept JSON {phone, body, scheduled_time} and create a MessageQueue entry.
 
     Required fields:
@@ -28,6 +57,13 @@ def trigger_action(request):
 
     The Twilio WhatsApp number (from_number) is taken from TWILIO_WHATSAPP_FROM env variable.
     If required fields are missing, returns error.
+
+    With an Idempotency-Key header (or idempotency_key field), a repeat of a
+    request returns the original queued_id with "duplicate": true instead of
+    scheduling the message again.
+
+    Async: under an ASGI server the insert runs on the async ORM, so a burst
+    of requests doesn't need a blocked thread each.
     """
     try:
         payload = json.loads(request.body.decode("utf-8") or "{}")
@@ -36,22 +72,155 @@ def trigger_action(request):
             {"success": False, "error": f"Invalid JSON: {str(e)}"}, status=400
         )
 
-    phone = payload.get("phone")
-    body = payload.get("body")
-    scheduled_time_str = payload.get("scheduled_time")
+    if isinstance(payload, dict) and idempotency.request_key(request):
+        payload["idempotency_key"] = idempotency.request_key(request)
 
-    # Get from_number from environment variable (fallback to settings)
-    from_number = os.environ.get("TWILIO_WHATSAPP_FROM") or getattr(
-        settings, "TWILIO_WHATSAPP_FROM", ""
-    )
+    # from_number is taken from TWILIO_WHATSAPP_FROM
+    try:
+        fields = clean_message(payload, default_from_number())
+    except MessageValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    scheduled_time = fields["scheduled_time"]
+    key = fields["idempotency_key"]
 
-    # Validate required fields
-    if not phone:
+    # A retried request is answered from Redis without touching the database
+    if key:
+        queued_id = await sync_to_async(idempotency.cached_id)(
+            fields["from_number"], key
+        )
+        if queued_id is not None:
+            return JsonResponse(
+                {"success": True, "queued_id": queued_id, "duplicate": True}
+            )
+
+    # Create the message queue entry
+    try:
+        try:
+            mq = await MessageQueue.objects.acreate(
+                status=MessageQueue.STATUS_PENDING, **fields
+            )
+        except IntegrityError:
+            if not key:
+                raise
+            # The key is taken: a repeat, or an expired key that
+            # find_existing() releases for this request to reuse
+            existing = await sync_to_async(idempotency.find_existing)(
+                fields["from_number"], [key]
+            )
+            if key in existing:
+                return JsonResponse(
+                    {"success": True, "queued_id": existing[key], "duplicate": True}
+                )
+            mq = await MessageQueue.objects.acreate(
+                status=MessageQueue.STATUS_PENDING, **fields
+            )
+        await sync_to_async(_after_create)(mq)
         return JsonResponse(
-            {"success": False, "error": "phone is required"}, status=400
+            {
+                "success": True,
+                "queued_id": mq.id,
+                "scheduled_time": scheduled_time.isoformat(),
+            }
         )
-    if not body:
-        return JsonResponse({"success": False, "error": "body is required"}, status=400)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+
+def _after_create(mq):
+    # Blocking Redis calls, run off the event loop by the async views
+    schedule_delayed([(mq.id, mq.scheduled_time)])
+    cache_messages([mq])
+    idempotency.remember([mq])
+
+
+def _spool_results(scheduled):
+    """Consume bulk_schedule results, spooling them to disk past 1MB.
+
+    Returns (results file positioned at the start, counts) where counts has
+    the number of items created, duplicates and failed.
+    """
+    results = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+")
+    counts = {"created": 0, "duplicates": 0, "failed": 0}
+    for index, queued_id, error, duplicate in scheduled:
+        if error is not None:
+            entry = {"index": index, "error": error}
+            counts["failed"] += 1
+        elif duplicate:
+            entry = {"index": index, "queued_id": queued_id, "duplicate": True}
+            counts["duplicates"] += 1
+        else:
+            entry = {"index": index, "queued_id": queued_id}
+            counts["created"] += 1
+        separator = "," if sum(counts.values()) > 1 else ""
+        results.write(separator + json.dumps(entry))
+    results.seek(0)
+    return results, counts
+
+
+def _streaming_body(request, chunks):
+    """Body for a StreamingHttpResponse from the sync iterator ``chunks``.
+
+    Django buffers the whole body when the iterator type doesn't match the
+    server: WSGI (runserver, run_all.sh) needs a sync iterator, ASGI an async
+    one. Under ASGI the chunks are produced off the event loop one at a time.
+    """
+    if not isinstance(request, ASGIRequest):
+        return chunks
+
+    async def in_thread():
+        done = object()
+        while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+            yield chunk
+
+    return in_thread()
+
+
+def _stream_results(request, results, counts):
+    """Streaming JSON response for _spool_results() output."""
+
+    def stream():
+        with results:
+            yield (
+                f'{{"success": true, "created": {counts["created"]}, '
+                f'"duplicates": {counts["duplicates"]}, '
+                f'"failed": {counts["failed"]}, "results": ['
+            )
+            while chunk := results.read(64 * 1024):
+                yield chunk
+            yield "]}"
+
+    return StreamingHttpResponse(
+        _streaming_body(request, stream()), content_type="application/json"
+    )
+
+
+def _request_items(request):
+    """Parsed items of a bulk request body: NDJSON or a JSON array."""
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        return iter_ndjson(request)
+    return iter_json_array(request)
+
+
+@csrf_exempt
+@require_POST
+async def trigger_bulk(request):
+    """Schedule many messages in one request.
+
+    The body is either a JSON array of {phone, body, scheduled_time} objects
+    or, with an NDJSON content type (application/x-ndjson), one such object
+    per line. Items are validated like trigger_action and inserted in chunks
+    while the body is read, so memory use stays flat for any payload size.
+
+    Returns {success, created, duplicates, failed, results} where results
+    has one {index, queued_id} or {index, error} entry per item, in input
+    order.
+
+    Items may carry an idempotency_key; an Idempotency-Key header gives every
+    item without one the key "<header>:<index>", so retrying the whole
+    request returns the original queued_ids, marked "duplicate": true and
+    counted as duplicates rather than created.
+    """
+    from_number = default_from_number()
     if not from_number:
         return JsonResponse(
             {
@@ -60,51 +229,486 @@ def trigger_action(request):
             },
             status=400,
         )
-    if not scheduled_time_str:
+
+    # Parsing and chunked inserts are blocking; keep them off the event loop
+    items = _request_items(request)
+    if idempotency.request_key(request):
+        items = _keyed_items(items, idempotency.request_key(request))
+    results, counts = await sync_to_async(_spool_results)(
+        bulk_schedule(items, from_number)
+    )
+    return _stream_results(request, results, counts)
+
+
+def _keyed_items(items, request_key):
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and not item.get("idempotency_key"):
+            item["idempotency_key"] = f"{request_key}:{index}"
+        yield item
+
+
+CAMPAIGN_FIELDS = ("id", "name", "from_number", "scheduled_time", "created_at")
+
+
+def _campaign_json(campaign):
+    data = {field: getattr(campaign, field) for field in CAMPAIGN_FIELDS}
+    data["progress"] = progress(campaign)
+    return data
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+async def campaigns(request):
+    """List campaigns (GET) or create one (POST).
+
+    POST takes JSON {name, body, scheduled_time, recipients}. ``body`` may
+    contain {placeholder} fields filled from each recipient's ``variables``;
+    ``recipients`` is an optional list of {phone, variables} objects (use
+    campaign_recipients for large lists). Returns {success, campaign_id,
+    created, failed, errors} where errors lists rejected recipients.
+
+    GET returns the newest campaigns (limit, default 100, max 1000; before=id
+    for the next page) with per-status progress counters instead of rows.
+    """
+    if request.method == "GET":
+        try:
+            limit = int(request.GET.get("limit", LIST_DEFAULT_LIMIT))
+            before = int(request.GET["before"]) if request.GET.get("before") else None
+        except ValueError:
+            return JsonResponse(
+                {"success": False, "error": "limit and before must be integers"},
+                status=400,
+            )
+        queryset = Campaign.objects.order_by("-id")
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        rows = [
+            _campaign_json(campaign)
+            async for campaign in with_progress(queryset)[:limit]
+        ]
         return JsonResponse(
-            {"success": False, "error": "scheduled_time is required"}, status=400
+            {"success": True, "results": rows}, encoder=DjangoJSONEncoder
         )
 
-    # Parse scheduled_time
     try:
-        from dateutil import parser as date_parser
+        payload = json.loads(request.body.decode("utf-8") or "{}")
+    except Exception as e:
+        return JsonResponse(
+            {"success": False, "error": f"Invalid JSON: {str(e)}"}, status=400
+        )
+    try:
+        fields = clean_campaign(payload, default_from_number())
+        recipients = payload.get("recipients") or []
+        if not isinstance(recipients, list):
+            raise MessageValidationError("recipients must be a list")
+    except MessageValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    campaign = await Campaign.objects.acreate(**fields)
+    created, errors = await sync_to_async(_add_inline_recipients)(campaign, recipients)
+    return JsonResponse(
+        {
+            "success": True,
+            "campaign_id": campaign.id,
+            "created": created,
+            "failed": len(errors),
+            "errors": errors,
+        }
+    )
+
+
+def _add_inline_recipients(campaign, recipients):
+    created, errors = 0, []
+    for index, _, error, _ in add_recipients(campaign, recipients):
+        if error is None:
+            created += 1
+        else:
+            errors.append({"index": index, "error": error})
+    return created, errors
+
+
+@require_GET
+async def campaign_detail(request, campaign_id):
+    """Return a campaign, its body template and its progress counters."""
+    campaign = await with_progress(Campaign.objects.filter(pk=campaign_id)).afirst()
+    if campaign is None:
+        return JsonResponse(
+            {"success": False, "error": "Campaign not found"}, status=404
+        )
+    return JsonResponse(
+        {"success": True, "body": campaign.body, **_campaign_json(campaign)},
+        encoder=DjangoJSONEncoder,
+    )
+
+
+@csrf_exempt
+@require_POST
+async def campaign_recipients(request, campaign_id):
+    """Add recipients to a campaign.
+
+    The body is a JSON array of {phone, variables} objects or NDJSON, read
+    and inserted in chunks like trigger_bulk, with the same response.
+    Recipients are scheduled at the campaign's scheduled_time.
+    """
+    campaign = await Campaign.objects.filter(pk=campaign_id).afirst()
+    if campaign is None:
+        return JsonResponse(
+            {"success": False, "error": "Campaign not found"}, status=404
+        )
+    results, counts = await sync_to_async(_spool_results)(
+        add_recipients(campaign, _request_items(request))
+    )
+    return _stream_results(request, results, counts)
+
 
-        scheduled_time = date_parser.parse(scheduled_time_str)
-        # Ensure timezone-aware
-        if scheduled_time.tzinfo is None:
-            scheduled_time = timezone.make_aware(scheduled_time)
+RECURRING_FIELDS = (
+    "id",
+    "name",
+    "phone",
+    "body",
+    "from_number",
+    "rrule",
+    "time_zone",
+    "dtstart",
+    "next_run_at",
+    "active",
+    "created_at",
+)
+
+
+@csrf_exempt
+@require_POST
+async def create_recurring(request):
+    """Create a recurring schedule.
+
+    Accepts JSON {phone, body, rrule, dtstart, time_zone, name}: ``rrule`` is
+    an RFC 5545 recurrence rule (e.g. FREQ=DAILY;BYHOUR=9;BYMINUTE=0),
+    ``dtstart`` defaults to now and ``time_zone`` (the zone the rule is
+    evaluated in) to UTC. Returns {success, schedule_id, next_run_at}.
+    """
+    try:
+        payload = json.loads(request.body.decode("utf-8") or "{}")
     except Exception as e:
         return JsonResponse(
-            {"success": False, "error": f"Invalid scheduled_time format: {str(e)}"},
-            status=400,
+            {"success": False, "error": f"Invalid JSON: {str(e)}"}, status=400
         )
+    try:
+        fields = clean_schedule(payload, default_from_number())
+    except MessageValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
-    # Validate scheduled_time is in the future
-    if scheduled_time <= timezone.now():
+    schedule = await RecurringSchedule.objects.acreate(**fields)
+    return JsonResponse(
+        {
+            "success": True,
+            "schedule_id": schedule.id,
+            "next_run_at": schedule.next_run_at.isoformat(),
+        }
+    )
+
+
+@csrf_exempt
+@require_http_methods(["GET", "DELETE"])
+async def recurring_detail(request, schedule_id):
+    """Return a recurring schedule (GET) or stop it (DELETE).
+
+    Stopping keeps occurrences that were already materialised within the
+    look-ahead window; they are sent as scheduled.
+    """
+    schedules = RecurringSchedule.objects.filter(pk=schedule_id)
+    if request.method == "DELETE":
+        if not await schedules.aupdate(active=False, next_run_at=None):
+            return JsonResponse(
+                {"success": False, "error": "Schedule not found"}, status=404
+            )
+        return JsonResponse({"success": True})
+
+    row = await schedules.values(*RECURRING_FIELDS).afirst()
+    if row is None:
         return JsonResponse(
-            {"success": False, "error": "scheduled_time must be in the future"},
-            status=400,
+            {"success": False, "error": "Schedule not found"}, status=404
         )
+    return JsonResponse({"success": True, **row}, encoder=DjangoJSONEncoder)
 
-    # Create the message queue entry
+
+MESSAGE_FIELDS = (
+    "id",
+    "phone",
+    "from_number",
+    "status",
+    "scheduled_time",
+    "attempts",
+    "result",
+    "created_at",
+    "processed_at",
+)
+EXPORT_CHUNK_SIZE = 2000
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+# ``source`` query parameter of the listing/export endpoints
+MESSAGE_SOURCES = {"live": MessageQueue, "archive": MessageArchive}
+
+
+def _filter_messages(params):
+    """Build a MessageQueue filter from request query parameters.
+
+    ``status`` may be a comma-separated list; ``since``/``until`` bound
+    scheduled_time (inclusive / exclusive); ``phone`` and ``from_number``
+    match exactly. Raises MessageValidationError on bad values.
+    """
+    filters = Q()
+    for field in ("phone", "from_number"):
+        if params.get(field):
+            filters &= Q(**{field: params[field]})
+    if params.get("status"):
+        statuses = params["status"].split(",")
+        valid = {choice for choice, _ in MessageQueue.STATUS_CHOICES}
+        unknown = [s for s in statuses if s not in valid]
+        if unknown:
+            raise MessageValidationError(f"Unknown status: {', '.join(unknown)}")
+        filters &= Q(status__in=statuses)
+    bounds = (("since", "scheduled_time__gte"), ("until", "scheduled_time__lt"))
+    for param, lookup in bounds:
+        if params.get(param):
+            try:
+                filters &= Q(**{lookup: parse_scheduled_time(params[param])})
+            except Exception as e:
+                raise MessageValidationError(f"Invalid {param}: {str(e)}")
+    return filters
+
+
+def _message_source(params):
+    """The model to read for ``source``: live MessageQueue or MessageArchive.
+
+    Rows keep their id when archived, so both are paged with the same
+    (scheduled_time, id) cursor. Raises MessageValidationError on bad values.
+    """
+    source = params.get("source", "live")
+    if source not in MESSAGE_SOURCES:
+        raise MessageValidationError("source must be live or archive")
+    return MESSAGE_SOURCES[source]
+
+
+def _after(scheduled_time, message_id):
+    """Keyset condition for rows after (scheduled_time, id)."""
+    return Q(scheduled_time__gt=scheduled_time) | Q(
+        scheduled_time=scheduled_time, id__gt=message_id
+    )
+
+
+def _encode_cursor(scheduled_time, message_id):
+    raw = json.dumps([scheduled_time.isoformat(), message_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
     try:
-        mq = MessageQueue.objects.create(
-            phone=phone,
-            body=body,
-            from_number=from_number,
-            scheduled_time=scheduled_time,
-            status=MessageQueue.STATUS_PENDING,
+        scheduled_time, message_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return parse_scheduled_time(scheduled_time), int(message_id)
+    except Exception:
+        raise MessageValidationError("Invalid cursor")
+
+
+def _iter_export_rows(model, filters):
+    """Walk matching rows in (scheduled_time, id) order, one keyset chunk at a time.
+
+    Each chunk is a short indexed query, so exporting millions of rows never
+    materialises the queryset or holds a long-running cursor open.
+    """
+    queryset = model.objects.filter(filters).order_by("scheduled_time", "id")
+    cursor = Q()
+    while True:
+        rows = list(
+            queryset.filter(cursor).values_list(*MESSAGE_FIELDS)[:EXPORT_CHUNK_SIZE]
         )
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]
+        cursor = _after(last[MESSAGE_FIELDS.index("scheduled_time")], last[0])
+
+
+@require_GET
+async def export_messages(request):
+    """Stream MessageQueue rows as CSV (default) or NDJSON.
+
+    Query parameters: format=csv|ndjson, status (comma-separated), since and
+    until (ISO datetimes bounding scheduled_time), and source=live|archive.
+    The live table (default) no longer holds messages moved out by
+    archive_messages; source=archive exports those instead. Message bodies
+    are not exported. Bytes start flowing after the first chunk is read.
+    """
+    export_format = request.GET.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
         return JsonResponse(
-            {
-                "success": True,
-                "queued_id": mq.id,
-                "scheduled_time": scheduled_time.isoformat(),
-            }
+            {"success": False, "error": "format must be csv or ndjson"}, status=400
         )
+    try:
+        model = _message_source(request.GET)
+        filters = _filter_messages(request.GET)
+    except MessageValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    def as_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MESSAGE_FIELDS)
+        for rows in _iter_export_rows(model, filters):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def as_ndjson():
+        for rows in _iter_export_rows(model, filters):
+            yield "".join(
+                json.dumps(dict(zip(MESSAGE_FIELDS, row)), cls=DjangoJSONEncoder) + "\n"
+                for row in rows
+            )
+
+    if export_format == "csv":
+        response = StreamingHttpResponse(
+            _streaming_body(request, as_csv()), content_type="text/csv"
+        )
+    else:
+        response = StreamingHttpResponse(
+            _streaming_body(request, as_ndjson()),
+            content_type="application/x-ndjson",
+        )
+    response["Content-Disposition"] = (
+        f'attachment; filename="messages.{export_format}"'
+    )
+    return response
+
+
+@require_GET
+async def list_messages(request):
+    """List messages in (scheduled_time, id) order with cursor pagination.
+
+    Query parameters: status (comma-separated), phone, from_number, since,
+    until, limit (default 100, max 1000), cursor (the next_cursor of the
+    previous page) and source=live|archive. Pages are fetched with a keyset
+    condition instead of OFFSET and no total count is computed, so a page
+    deep into the table costs the same as the first one. The live table
+    (default) no longer holds messages moved out by archive_messages; list
+    those with source=archive.
+
+    Returns {success, results, next_cursor}; next_cursor is null on the last
+    page.
+    """
+    try:
+        model = _message_source(request.GET)
+        filters = _filter_messages(request.GET)
+        if request.GET.get("cursor"):
+            filters &= _after(*_decode_cursor(request.GET["cursor"]))
+        limit = int(request.GET.get("limit", LIST_DEFAULT_LIMIT))
+    except MessageValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    except ValueError:
+        return JsonResponse(
+            {"success": False, "error": "limit must be an integer"}, status=400
+        )
+    limit = min(max(limit, 1), LIST_MAX_LIMIT)
+
+    # One extra row tells whether there is a next page
+    rows = [
+        row
+        async for row in model.objects.filter(filters)
+        .order_by("scheduled_time", "id")
+        .values(*MESSAGE_FIELDS)[: limit + 1]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["scheduled_time"], rows[-1]["id"])
+
+    return JsonResponse(
+        {"success": True, "results": rows, "next_cursor": next_cursor}
+    )
+
+
+@require_GET
+async def message_status(request, message_id):
+    """Return the delivery status of one message.
+
+    Served from the Redis status cache that the scheduler and workers keep
+    up to date; a miss costs one primary-key query and refills the cache.
+    Messages moved out by archive_messages are looked up in the archive.
+    """
+    cached = await sync_to_async(get_cached_status)(message_id)
+    if cached is not None:
+        return JsonResponse({"success": True, **cached})
+
+    row = await (
+        MessageQueue.objects.filter(pk=message_id).values(*STATUS_FIELDS).afirst()
+    )
+    if row is None:
+        row = await (
+            MessageArchive.objects.filter(pk=message_id)
+            .values(*STATUS_FIELDS)
+            .afirst()
+        )
+    if row is None:
+        return JsonResponse(
+            {"success": False, "error": "Message not found"}, status=404
+        )
+    await sync_to_async(fill_status)(row)
+    for field in ("scheduled_time", "processed_at"):
+        if row[field] is not None:
+            row[field] = row[field].isoformat()
+    return JsonResponse({"success": True, **row})
+
+
+@require_GET
+def metrics(request):
+    """Expose scheduler/worker metrics in the Prometheus text format.
+
+    Besides the counters and histograms flushed by the worker and scheduler
+    processes, reports the Redis queue lengths and the number of live
+    (pending/enqueued/processing) messages per status.
+    """
+    live_statuses = [
+        MessageQueue.STATUS_PENDING,
+        MessageQueue.STATUS_ENQUEUED,
+        MessageQueue.STATUS_PROCESSING,
+    ]
+    counts = dict.fromkeys(live_statuses, 0)
+    counts.update(
+        MessageQueue.objects.filter(status__in=live_statuses)
+        .order_by()
+        .values_list("status")
+        .annotate(count=Count("id"))
+    )
+    try:
+        redis_client = get_redis_client()
+        keys = queue_keys()
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        gauges = [
+            (
+                "whatsapp_queue_length",
+                "Message IDs waiting in the Redis work queue, per shard",
+                [({"queue": key}, length) for key, length in zip(keys, pipe.execute())],
+            ),
+            (
+                "whatsapp_delayed_queue_length",
+                "Message IDs waiting in the Redis delayed queue",
+                [({}, redis_client.zcard(settings.REDIS_DELAYED_KEY))],
+            ),
+            (
+                "whatsapp_live_messages",
+                "Messages not yet sent or failed, by status",
+                [({"status": state}, count) for state, count in counts.items()],
+            ),
+        ]
+        body = metrics_registry.render(gauges)
     except Exception as e:
-        return JsonResponse({"success": False, "error": str(e)}, status=500)
+        return HttpResponse(f"# metrics unavailable: {e}\n", status=503)
+    return HttpResponse(body, content_type="text/plain; version=0.0.4")
 
 
-def status(request):
+async def status(request):
     return JsonResponse({"status": "ok", "time": timezone.now().isoformat()})
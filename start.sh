@@ -28,15 +28,34 @@ fi
 # Start all services using a process manager or background processes
 echo "Starting services..."
 
-# Start scheduler loop in background
-python manage.py scheduler_loop &
-SCHEDULER_PID=$!
-
-# Start worker in background  
-python manage.py worker &
-WORKER_PID=$!
-
-# Start Django server (foreground - this keeps the container alive)
-echo "Starting Django server on 0.0.0.0:${PORT:-8000}..."
-exec python manage.py runserver 0.0.0.0:${PORT:-8000}
+# Start the scheduler loop and worker pool under one supervisor
+# (DISPATCHER_WORKERS worker processes, default: one per CPU)
+python manage.py run_dispatcher ${DISPATCHER_WORKERS:+--workers $DISPATCHER_WORKERS} &
+DISPATCHER_PID=$!
+
+# Start the web server
+# WEB_SERVER=uvicorn (default) serves the async views under ASGI with
+# WEB_CONCURRENCY worker processes; WEB_SERVER=runserver uses the dev server
+if [ "${WEB_SERVER:-uvicorn}" = "runserver" ]; then
+    echo "Starting Django dev server on 0.0.0.0:${PORT:-8000}..."
+    python manage.py runserver 0.0.0.0:${PORT:-8000} &
+else
+    echo "Starting uvicorn on 0.0.0.0:${PORT:-8000} with ${WEB_CONCURRENCY:-2} workers..."
+    uvicorn whatsapp_scheduler.asgi:application \
+        --host 0.0.0.0 --port ${PORT:-8000} \
+        --workers ${WEB_CONCURRENCY:-2} &
+fi
+WEB_PID=$!
+
+# Forward the container's SIGTERM so workers drain in-flight sends
+stop() {
+    echo "Stopping services..."
+    kill -TERM $WEB_PID $DISPATCHER_PID 2>/dev/null || true
+    wait
+}
+trap stop SIGTERM SIGINT
+
+# Keep the container alive while the web server runs
+wait $WEB_PID
+stop
 
@@ -2,12 +2,25 @@
 
 Add real WhatsApp integration here; for now the endpoint calls this
 function which performs a light-weight action and returns a string.
+
+Messages are sent through send_whatsapp(), which dispatches to the backend
+named by WHATSAPP_SENDER_BACKEND:
+  - twilio (default): the real Twilio API
+  - dry_run: logs the message and returns a fake sid, no network
+  - http_stub: POSTs to a local fake Twilio (manage.py fake_twilio) at
+    WHATSAPP_STUB_URL, for load tests and benchmarks
 """
 
 import logging
 import os
+import threading
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
 # Load .env file from project root (same directory as manage.py)
@@ -16,6 +29,101 @@ load_dotenv(BASE_DIR / ".env")
 
 logger = logging.getLogger(__name__)
 
+# Process-level Twilio client cache. Building a Client per message means a new
+# HTTP session (and TLS handshake) per send; instead one client per set of
+# credentials is kept with a keep-alive connection pool. It is rebuilt when the
+# credentials change and dropped in forked children so processes never share
+# sockets.
+_client_lock = threading.Lock()
+_client_cache = {}  # (account_sid, auth_token) -> Client
+_client_pid = os.getpid()
+_pool_size = int(os.environ.get("TWILIO_HTTP_POOL_SIZE", 10))
+_stub_session = None  # keep-alive session of the http_stub backend
+
+
+def _reset_client_cache_after_fork():
+    global _client_lock, _client_pid, _stub_session
+    # The parent's sessions (and lock state) must not be used in the child;
+    # just forget them without closing the parent's sockets.
+    _client_lock = threading.Lock()
+    _client_cache.clear()
+    _stub_session = None
+    _client_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client_cache_after_fork)
+
+
+def _close_cached_clients():
+    global _stub_session
+    for client in _client_cache.values():
+        client.http_client.session.close()
+    _client_cache.clear()
+    if _stub_session is not None:
+        _stub_session.close()
+        _stub_session = None
+
+
+def configure_twilio_pool(pool_size: int):
+    """Size the keep-alive pool of the cached Twilio client (and stub session).
+
+    Call this with the number of concurrent sends (e.g. worker --concurrency)
+    so every in-flight send can reuse an open connection.
+    """
+    global _pool_size
+    pool_size = max(1, pool_size)
+    with _client_lock:
+        if pool_size != _pool_size:
+            _pool_size = pool_size
+            _close_cached_clients()
+
+
+def get_twilio_client(account_sid: str, auth_token: str):
+    """Return the cached Twilio client for these credentials, building it once."""
+    global _client_pid, _stub_session
+    key = (account_sid, auth_token)
+    with _client_lock:
+        if _client_pid != os.getpid():
+            # Forked without register_at_fork support
+            _client_cache.clear()
+            _stub_session = None
+            _client_pid = os.getpid()
+
+        client = _client_cache.get(key)
+        if client is None:
+            # Credentials changed (or first use): drop clients for old ones
+            _close_cached_clients()
+            http_client = TwilioHttpClient(pool_connections=True)
+            http_client.session.mount(
+                "https://", HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            )
+            client = Client(account_sid, auth_token, http_client=http_client)
+            _client_cache[key] = client
+        return client
+
+
+def _get_stub_session():
+    """Return the keep-alive session used by the http_stub backend."""
+    global _client_pid, _stub_session
+    with _client_lock:
+        if _client_pid != os.getpid():
+            _client_cache.clear()
+            _stub_session = None
+            _client_pid = os.getpid()
+
+        if _stub_session is None:
+            _stub_session = requests.Session()
+            _stub_session.mount(
+                "http://", HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            )
+        return _stub_session
+
+
+def _whatsapp_address(number: str):
+    # Twilio's WhatsApp API expects numbers like 'whatsapp:+123456789'
+    return number if number.startswith("whatsapp:") else f"whatsapp:{number}"
+
 
 def trigger_action():
     """Backward-compatible placeholder used by the earlier UI trigger.
@@ -52,15 +160,9 @@ def send_whatsapp_via_twilio(phone: str, body: str, from_number: str):
     if not from_number:
         raise RuntimeError("from_number is required")
 
-    client = Client(account_sid, auth_token)
-    # Twilio's WhatsApp API expects 'to' like 'whatsapp:+123456789'
-    to = phone if phone.startswith("whatsapp:") else f"whatsapp:{phone}"
-    # Ensure from_number has whatsapp: prefix
-    from_whatsapp = (
-        from_number
-        if from_number.startswith("whatsapp:")
-        else f"whatsapp:{from_number}"
-    )
+    client = get_twilio_client(account_sid, auth_token)
+    to = _whatsapp_address(phone)
+    from_whatsapp = _whatsapp_address(from_number)
     message = client.messages.create(body=body, from_=from_whatsapp, to=to)
     logger.info(
         "Sent WhatsApp message sid=%s from=%s to=%s",
@@ -69,3 +171,61 @@ def send_whatsapp_via_twilio(phone: str, body: str, from_number: str):
         to,
     )
     return getattr(message, "sid", None)
+
+
+def send_whatsapp_dry_run(phone: str, body: str, from_number: str):
+    """Pretend to send a message: log it and return a fake sid."""
+    if not from_number:
+        raise RuntimeError("from_number is required")
+    sid = f"DRYRUN{uuid.uuid4().hex}"
+    logger.info(
+        "Dry run: WhatsApp message sid=%s from=%s to=%s",
+        sid,
+        _whatsapp_address(from_number),
+        _whatsapp_address(phone),
+    )
+    return sid
+
+
+def send_whatsapp_via_stub(phone: str, body: str, from_number: str):
+    """Send a message to the local fake Twilio server (manage.py fake_twilio).
+
+    Error responses raise TwilioRestException with the HTTP status, so retries
+    and rate limiting react to them as they would to the real API.
+    """
+    if not from_number:
+        raise RuntimeError("from_number is required")
+
+    url = os.environ.get("WHATSAPP_STUB_URL", "http://127.0.0.1:8765/messages")
+    response = _get_stub_session().post(
+        url,
+        data={
+            "To": _whatsapp_address(phone),
+            "From": _whatsapp_address(from_number),
+            "Body": body,
+        },
+        timeout=30,
+    )
+    if response.status_code >= 400:
+        raise TwilioRestException(response.status_code, url, msg=response.text)
+    return response.json().get("sid")
+
+
+SENDER_BACKENDS = {
+    "twilio": send_whatsapp_via_twilio,
+    "dry_run": send_whatsapp_dry_run,
+    "http_stub": send_whatsapp_via_stub,
+}
+
+
+def send_whatsapp(phone: str, body: str, from_number: str):
+    """Send a message with the backend named by WHATSAPP_SENDER_BACKEND.
+
+    Returns the message sid from the backend.
+    """
+    backend = os.environ.get("WHATSAPP_SENDER_BACKEND", "twilio")
+    try:
+        sender = SENDER_BACKENDS[backend]
+    except KeyError:
+        raise RuntimeError(f"Unknown WHATSAPP_SENDER_BACKEND: {backend}")
+    return sender(phone, body, from_number)
@@ -86,6 +86,14 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock when a transaction starts, so concurrent
+            # scheduler/worker processes queue up for it (up to "timeout"
+            # seconds) instead of failing with "database is locked" when a
+            # read transaction tries to upgrade.
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -125,6 +133,11 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = os.environ.get("STATIC_ROOT", BASE_DIR / "staticfiles")
+
+# Serve static files from the ASGI app itself (uvicorn has no static file
+# handling). Turn off when a proxy or CDN serves STATIC_ROOT.
+SERVE_STATIC = os.environ.get("SERVE_STATIC", "True").lower() == "true"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -136,6 +149,75 @@ REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 REDIS_DB = int(os.environ.get("REDIS_DB", 0))
 REDIS_QUEUE_KEY = "whatsapp_message_queue"
+# Work queue shards. With more than one, message IDs are pushed to
+# "<REDIS_QUEUE_KEY>:<n>" by a hash of from_number, so a large campaign from
+# one sender fills a single shard while workers rotate over all of them.
+REDIS_QUEUE_SHARDS = max(1, int(os.environ.get("REDIS_QUEUE_SHARDS", 1)))
+# Seconds after it was pushed that an 'enqueued' message whose shard list has
+# emptied is assumed lost from Redis (flushed, or left in a shard no longer
+# read after REDIS_QUEUE_SHARDS changed); scheduler_loop then hands it back to
+# pending to be pushed again. 0 disables the check.
+ENQUEUED_STALE_AFTER = int(os.environ.get("ENQUEUED_STALE_AFTER", 1800))
+# Seconds a Redis worker may hold a claimed ('processing') message. A worker
+# killed mid-send leaves the row behind; once the lease expires scheduler_loop
+# hands it back to pending (or failed when out of attempts). Must exceed the
+# longest send, including rate limiter waits.
+PROCESSING_LEASE = int(os.environ.get("PROCESSING_LEASE", 600))
+
+# Delayed queue: a sorted set of message IDs scored by scheduled_time. When
+# enabled, new messages are added to it and scheduler_loop dispatches them at
+# their scheduled second, keeping the DB scan as a reconciliation sweep.
+DELAYED_QUEUE_ENABLED = (
+    os.environ.get("DELAYED_QUEUE_ENABLED", "False").lower() == "true"
+)
+REDIS_DELAYED_KEY = "whatsapp_message_delayed"
+
+# Seconds a message's status stays in the Redis status cache after its last
+# transition (serves GET /messages/<id>/). 0 disables the cache.
+STATUS_CACHE_TTL = int(os.environ.get("STATUS_CACHE_TTL", 3600))
+
+# Seconds ahead of now that recurring schedules are materialised into
+# MessageQueue rows on each scheduler pass. Must exceed the scheduler
+# --interval, or occurrences are enqueued late.
+RECURRING_LOOKAHEAD = int(os.environ.get("RECURRING_LOOKAHEAD", 600))
+
+# Seconds an Idempotency-Key stays bound to the message it created. A repeat
+# within this window returns the original message; after it the key can be
+# reused.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 86400))
+
+# Days sent/failed messages stay in MessageQueue before archive_messages moves
+# them to MessageArchive (or deletes them with --delete)
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", 30))
+
+# Metrics recorded by the scheduler and workers, aggregated across processes
+# in a Redis hash every METRICS_FLUSH_INTERVAL seconds and served at /metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+METRICS_FLUSH_INTERVAL = int(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+METRICS_REDIS_KEY = "whatsapp_metrics"
+
+# Per-sender rate limit shared by all workers (token bucket in Redis).
+# SENDER_RATE_LIMIT is in messages/second per from_number; 0 disables it.
+# Per-sender overrides: "whatsapp:+14155550100=20/40,whatsapp:+4420...=5/5"
+# (rate/burst). A 429 from Twilio halves the sender's rate for
+# SENDER_RATE_COOLDOWN seconds.
+SENDER_RATE_LIMIT = float(os.environ.get("SENDER_RATE_LIMIT", 0))
+SENDER_RATE_BURST = int(os.environ.get("SENDER_RATE_BURST", 10))
+SENDER_RATE_LIMITS = {
+    sender.strip(): (float(limit.split("/")[0]), int(limit.split("/")[-1]))
+    for sender, limit in (
+        item.rsplit("=", 1)
+        for item in os.environ.get("SENDER_RATE_LIMITS", "").split(",")
+        if "=" in item
+    )
+}
+SENDER_RATE_COOLDOWN = int(os.environ.get("SENDER_RATE_COOLDOWN", 60))
+
+# Retry policy for transient send failures (network errors, 429, 5xx):
+# exponential backoff with jitter, in seconds, up to SEND_MAX_ATTEMPTS tries.
+SEND_MAX_ATTEMPTS = int(os.environ.get("SEND_MAX_ATTEMPTS", 5))
+RETRY_BASE_DELAY = int(os.environ.get("RETRY_BASE_DELAY", 10))
+RETRY_MAX_DELAY = int(os.environ.get("RETRY_MAX_DELAY", 900))
 
 # Twilio WhatsApp number (from environment variable)
 TWILIO_WHATSAPP_FROM = os.environ.get("TWILIO_WHATSAPP_FROM", "")